@@ -1,11 +1,21 @@
-﻿import datetime
+﻿import atexit
+import datetime
 
 from bot.coroutine import background
 from . import tasks
+from .library import speedruncom
 
 
 async def call_refresh(timestamp: datetime.datetime) -> None:
     await tasks.refresh(timestamp)
 
 
+async def call_snapshot(timestamp: datetime.datetime) -> None:
+    await tasks.snapshot(timestamp)
+
+
+speedruncom.load_snapshot()
 background.add_task(call_refresh, datetime.timedelta(seconds=0.5))
+background.add_task(call_snapshot, datetime.timedelta(minutes=10))
+atexit.register(speedruncom.shutdown_session)
+atexit.register(speedruncom.save_snapshot)
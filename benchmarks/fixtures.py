@@ -0,0 +1,97 @@
+﻿from typing import Any, Dict, List
+
+
+def run(index: int,
+        playerCount: int) -> Dict[str, Any]:
+    return {
+        'id': f'r{index:07d}',
+        'game': 'o1y9wo6q',
+        'level': None,
+        'category': 'wkpoo02r',
+        'weblink': f'https://www.speedrun.com/sm64/run/r{index:07d}',
+        'date': f'2017-{index % 12 + 1:02d}-{index % 28 + 1:02d}',
+        'submitted': (f'2017-{index % 12 + 1:02d}-{index % 28 + 1:02d}'
+                      'T12:34:56Z'),
+        'times': {
+            'primary_t': 1000 + index * 0.01,
+            'realtime_t': 1000 + index * 0.01,
+            'realtime_noloads_t': 0,
+            'ingame_t': 0,
+            },
+        'players': [{'rel': 'user', 'id': f'p{index * 7 % playerCount:07d}'}],
+        }
+
+
+def leaderboard_rows(count: int) -> List[Dict[str, Any]]:
+    return [{'place': i + 1, 'run': run(i, count // 3 + 1)}
+            for i in range(count)]
+
+
+def leaderboard() -> Dict[str, Any]:
+    return {
+        'game': 'o1y9wo6q',
+        'level': None,
+        'category': 'wkpoo02r',
+        'weblink': 'https://www.speedrun.com/sm64',
+        'links': [],
+        }
+
+
+def category(index: int,
+             type: str) -> Dict[str, Any]:
+    return {
+        'id': f'c{index:04d}',
+        'name': f'Category {index}',
+        'type': type,
+        'weblink': f'https://www.speedrun.com/g#c{index:04d}',
+        'miscellaneous': False,
+        }
+
+
+def game(levelCount: int,
+         gameCategoryCount: int,
+         levelCategoryCount: int,
+         variableCount: int) -> Dict[str, Any]:
+    gameCategories: List[Dict[str, Any]]
+    gameCategories = [category(i, 'per-game')
+                      for i in range(gameCategoryCount)]
+    levelCategories: List[Dict[str, Any]]
+    levelCategories = [category(100 + i, 'per-level')
+                       for i in range(levelCategoryCount)]
+    scopes: List[str] = ['global', 'full-game', 'all-levels', 'single-level']
+    variables: List[Dict[str, Any]] = []
+    i: int
+    for i in range(variableCount):
+        scope: Dict[str, str] = {'type': scopes[i % 4]}
+        if scope['type'] == 'single-level':
+            scope['level'] = f'l{i % levelCount:04d}'
+        variables.append({
+            'id': f'v{i:04d}',
+            'name': f'Variable {i}',
+            'category': f'c{i % gameCategoryCount:04d}' if i % 2 else None,
+            'scope': scope,
+            'mandatory': False,
+            'is-subcategory': i % 3 == 0,
+            'user-defined': False,
+            'values': {
+                'values': {f'v{i:04d}a': {'label': 'A'},
+                           f'v{i:04d}b': {'label': 'B'}},
+                'default': f'v{i:04d}a',
+                },
+            })
+    return {
+        'id': 'g',
+        'names': {'international': 'Game', 'japanese': None, 'twitch': 'Game'},
+        'abbreviation': 'g',
+        'weblink': 'https://www.speedrun.com/g',
+        'regions': [],
+        'platforms': [],
+        'categories': {'data': gameCategories + levelCategories},
+        'levels': {'data': [{
+            'id': f'l{i:04d}',
+            'name': f'Level {i}',
+            'weblink': f'https://www.speedrun.com/g/l{i:04d}',
+            'categories': {'data': [dict(c) for c in levelCategories]},
+            } for i in range(levelCount)]},
+        'variables': {'data': variables},
+        }
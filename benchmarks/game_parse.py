@@ -0,0 +1,39 @@
+﻿import timeit
+import tracemalloc
+from typing import Any, Dict, Set
+
+from . import fixtures
+from ..library import speedruncom, speedrundata
+
+levelCount: int = 400
+gameCategoryCount: int = 5
+levelCategoryCount: int = 12
+variableCount: int = 40
+repeat: int = 15
+
+
+def main() -> None:
+    data: Dict[str, Any] = fixtures.game(levelCount, gameCategoryCount,
+                                         levelCategoryCount, variableCount)
+    game: speedrundata.Game = speedrundata.Game(data)
+
+    def parse() -> None:
+        speedruncom.parse_speedruncom_game_category_level(game, data)
+
+    parse()
+    best: float = min(timeit.repeat(parse, number=1, repeat=repeat))
+    tracemalloc.start()
+    parse()
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    objects: Set[int] = {id(c) for level in game.levels.values()
+                         if level is not None
+                         for c in level.categories.values()}
+    print(f'''\
+{levelCount} levels x {levelCategoryCount} categories: \
+{best * 1000:.2f} ms per refresh, {peak / 1024:.0f} KiB peak, \
+{len(objects)} level Category objects''')
+
+
+if __name__ == '__main__':
+    main()
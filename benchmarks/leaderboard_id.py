@@ -0,0 +1,40 @@
+﻿import timeit
+from typing import Dict, List
+
+from ..library import speedrundata
+
+count: int = 1000
+number: int = 200
+repeat: int = 5
+
+
+def leaderboard_id(index: int) -> speedrundata.LeaderboardId:
+    return speedrundata.LeaderboardId(
+        f'g{index % 50}', None, f'c{index % 7}', None, None,
+        {'v1': f'a{index % 3}', 'v2': f'b{index}'})
+
+
+def main() -> None:
+    ids: List[speedrundata.LeaderboardId] = [leaderboard_id(i)
+                                             for i in range(count)]
+    table: Dict[speedrundata.LeaderboardId, int] = {id: 1 for id in ids}
+    copies: List[speedrundata.LeaderboardId] = [leaderboard_id(i)
+                                                for i in range(count)]
+
+    def lookup(keys: List[speedrundata.LeaderboardId]) -> float:
+        best: float = min(timeit.repeat(lambda: [table[k] for k in keys],
+                                        number=number, repeat=repeat))
+        return best / number / count
+
+    same: float = lookup(ids)
+    equal: float = lookup(copies)
+    build: float = min(timeit.repeat(lambda: leaderboard_id(1),
+                                     number=number * count,
+                                     repeat=repeat)) / number / count
+    print(f'''\
+LeaderboardId: {same * 1e9:.0f} ns lookup by the same object, \
+{equal * 1e9:.0f} ns by an equal id, {build * 1e9:.0f} ns to construct''')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+﻿import json
+import timeit
+from typing import Any, Dict, List, Tuple
+
+from . import fixtures
+from ..library import speedrundata
+
+count: int = 10000
+repeat: int = 7
+
+
+def main() -> None:
+    rows: List[Dict[str, Any]] = json.loads(json.dumps(
+        fixtures.leaderboard_rows(count)))
+    leaderboard: speedrundata.Leaderboard
+
+    def build() -> None:
+        nonlocal leaderboard
+        leaderboard = speedrundata.Leaderboard('', fixtures.leaderboard())
+        leaderboard.update([(r['place'], speedrundata.Run(r['run']))
+                            for r in rows])
+
+    def refresh() -> None:
+        runs: List[Tuple[int, speedrundata.Run]] = []
+        row: Dict[str, Any]
+        for row in rows:
+            run: speedrundata.Run = runById[row['run']['id']]
+            run.update(row['run'])
+            runs.append((row['place'], run))
+        leaderboard.update(runs)
+
+    build()
+    runById: Dict[str, speedrundata.Run] = {
+        leaderboard.runIds[i]: speedrundata.Run(rows[i]['run'])
+        for i in range(count)}
+    label: str
+    for label, function in (('build', build), ('refresh', refresh)):
+        best: float = min(timeit.repeat(function, number=1, repeat=repeat))
+        print(f'''\
+{count}-run board {label}: {best * 1000:.1f} ms, \
+{best / count * 1e6:.2f} us per run''')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+﻿import gc
+import json
+import tracemalloc
+from typing import Any, Dict, List
+
+from . import fixtures
+from ..library import speedrundata
+
+count: int = 20000
+
+
+def main() -> None:
+    gc.collect()
+    tracemalloc.start()
+    before: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+    # Decoded JSON gives every run its own strings, like an API response
+    payloads: List[Dict[str, Any]] = json.loads(json.dumps(
+        [fixtures.run(i, count // 3) for i in range(count)]))
+    runs: List[speedrundata.Run] = [speedrundata.Run(p) for p in payloads]
+    del payloads
+    gc.collect()
+    after: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size: int = sum(s.size_diff for s in after.compare_to(before, 'filename'))
+    print(f'{len(runs)} runs: {size / count:.0f} bytes retained per run')
+
+
+if __name__ == '__main__':
+    main()
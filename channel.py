@@ -1,13 +1,11 @@
 ﻿from datetime import timedelta
 from typing import Dict, List, Optional  # noqa: F401
 
-import aioodbc.cursor  # noqa: F401
-
 from lib.data import ChatCommandArgs
 from lib.database import DatabaseMain
 from lib.helper.chat import cooldown, feature, permission
 
-from .library import speedruncom, speedrundata
+from .library import speedruncom, speedrundata, speedrunsettings
 
 
 @permission('moderator')
@@ -25,62 +23,45 @@ async def commandWR(args: ChatCommandArgs) -> bool:
 @feature('speedrun.com')
 async def commandWRCommand(args: ChatCommandArgs,
                            liteFormat: bool) -> bool:
-    db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    settings: speedrunsettings.ChannelSettings
+    chanGameId: Optional[str]
+    settings, chanGameId = await speedruncom.channel_config(
+        args.chat, args.message.query)
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, args.message.query, args.timestamp)
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, args.message.query, args.timestamp)
 
-        game: Optional[speedrundata.Game] = None
-        if (searched in speedruncom.gameSearch
-                and speedruncom.gameSearch[searched] in speedruncom.games):
-            game = speedruncom.games[speedruncom.gameSearch[searched]]
-
-        if game is None:
-            args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
-            return True
-        categories: Dict[str, speedrundata.Category] = game.game_categories
-
-        levelId: Optional[str] = await speedruncom.channel_levelid(
-            cursor, args.chat, game.id)
-        if levelId is not None and levelId in game.levels:
-            categories = game.levels[levelId].categories
+    game: Optional[speedrundata.Game] = None
+    if (searched in speedruncom.gameSearch
+            and speedruncom.gameSearch[searched] in speedruncom.games):
+        game = speedruncom.games[speedruncom.gameSearch[searched]]
 
-        categoryId: Optional[str] = await speedruncom.channel_categoryid(
-            cursor, args.chat, game.id, levelId)
-        if categoryId is None:
-            categoryId = speedruncom.default_categoryid(categories)
-        if categoryId not in categories:
-            args.chat.send(f'''\
+    if game is None:
+        args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
+        return True
+    resolved: speedrunsettings.ResolvedLeaderboard
+    resolved = speedruncom.resolve_leaderboard(settings, game)
+    if resolved.categoryId not in resolved.categories:
+        args.chat.send(f'''\
 Cannot find category for '{game.internationalName}'. Use !wrcategory to \
 change categories''')
-        variables: Dict[str, str] = speedruncom.default_sub_categories(
-            game, levelId, categoryId)
-        variables.update(
-            await speedruncom.channel_variables(cursor, args.chat, game.id,
-                                                levelId, categoryId))
-
-        regionId: Optional[str]
-        platformId: Optional[str]
-        regionId = await speedruncom.channel_region(cursor, args.chat, game.id)
-        platformId = await speedruncom.channel_platform(cursor, args.chat,
-                                                        game.id)
-
-        id: speedrundata.LeaderboardId = speedrundata.LeaderboardId(
-            game.id, levelId, categoryId, regionId, platformId, variables
-            )
-        await speedruncom.load_leaderboard(id, args.timestamp)
-        leaderboard: speedrundata.Leaderboard = speedruncom.leaderboards[id]
-        runIds: List[str] = [i for i, p in leaderboard.place.items() if p == 1]
-        if liteFormat:
-            args.chat.send(
-                speedruncom.messages_world_records_lite(id, runIds))
-        else:
-            args.chat.send(
-                speedruncom.messages_world_records(id, runIds))
+    if resolved.id is None:
+        return True
+
+    id: speedrundata.LeaderboardId = resolved.id
+    await speedruncom.load_leaderboard(id, args.timestamp,
+                                       channel=args.chat.channel)
+    if id not in speedruncom.leaderboards:
+        args.chat.send('speedrun.com is currently unavailable')
+        return True
+    leaderboard: speedrundata.Leaderboard = speedruncom.leaderboards[id]
+    runIds: List[str] = leaderboard.world_records()
+    if liteFormat:
+        args.chat.send(
+            speedruncom.messages_world_records_lite(id, runIds))
+    else:
+        args.chat.send(
+            speedruncom.messages_world_records(id, runIds))
     return True
 
 
@@ -99,72 +80,54 @@ async def commandPB(args: ChatCommandArgs) -> bool:
 @feature('speedrun.com')
 async def commandPBCommand(args: ChatCommandArgs,
                            liteFormat: bool) -> bool:
-    db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        userId: str = await speedruncom.channel_user(cursor, args.chat)
-        await speedruncom.load_user(userId, args.timestamp)
-        playerId: str = ''
-        if args.chat.channel in speedruncom.playerLookup:
-            playerId = speedruncom.playerLookup[userId]
-        if playerId not in speedruncom.players:
-            args.chat.send(f'Cannot find {args.chat.channel} on speedrun.com')
-            return True
-
-        chanGameId: Optional[str] = await speedruncom.channel_gameid(
-            cursor, args.chat)
-
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, args.message.query, args.timestamp)
-
-        game: Optional[speedrundata.Game] = None
-        if (searched in speedruncom.gameSearch
-                and speedruncom.gameSearch[searched] in speedruncom.games):
-            game = speedruncom.games[speedruncom.gameSearch[searched]]
+    settings: speedrunsettings.ChannelSettings
+    chanGameId: Optional[str]
+    settings, chanGameId = await speedruncom.channel_config(
+        args.chat, args.message.query)
+
+    userId: str = settings.userid()
+    await speedruncom.load_user(userId, args.timestamp, args.chat.channel)
+    playerId: str = ''
+    if args.chat.channel in speedruncom.playerLookup:
+        playerId = speedruncom.playerLookup[userId]
+    if playerId not in speedruncom.players:
+        args.chat.send(f'Cannot find {args.chat.channel} on speedrun.com')
+        return True
 
-        if game is None:
-            args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
-            return True
-        categories: Dict[str, speedrundata.Category] = game.game_categories
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, args.message.query, args.timestamp)
 
-        levelId: Optional[str] = await speedruncom.channel_levelid(
-            cursor, args.chat, game.id)
-        if levelId is not None and levelId in game.levels:
-            categories = game.levels[levelId].categories
+    game: Optional[speedrundata.Game] = None
+    if (searched in speedruncom.gameSearch
+            and speedruncom.gameSearch[searched] in speedruncom.games):
+        game = speedruncom.games[speedruncom.gameSearch[searched]]
 
-        categoryId: Optional[str] = await speedruncom.channel_categoryid(
-            cursor, args.chat, game.id, levelId)
-        if categoryId is None:
-            categoryId = speedruncom.default_categoryid(categories)
-        if categoryId not in categories:
-            args.chat.send(f'''\
+    if game is None:
+        args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
+        return True
+    resolved: speedrunsettings.ResolvedLeaderboard
+    resolved = speedruncom.resolve_leaderboard(settings, game)
+    if resolved.categoryId not in resolved.categories:
+        args.chat.send(f'''\
 Cannot find category for '{game.internationalName}'. Use !wrcategory to \
 change categories''')
-        variables: Dict[str, str] = speedruncom.default_sub_categories(
-            game, levelId, categoryId)
-        variables.update(
-            await speedruncom.channel_variables(cursor, args.chat, game.id,
-                                                levelId, categoryId))
-
-        regionId: Optional[str]
-        platformId: Optional[str]
-        regionId = await speedruncom.channel_region(cursor, args.chat, game.id)
-        platformId = await speedruncom.channel_platform(cursor, args.chat,
-                                                        game.id)
-
-        id: speedrundata.LeaderboardId = speedrundata.LeaderboardId(
-            game.id, levelId, categoryId, regionId, platformId, variables)
-        await speedruncom.load_leaderboard(id, args.timestamp)
-        leaderboard: speedrundata.Leaderboard = speedruncom.leaderboards[id]
-        runId: Optional[str] = None
-        if playerId in leaderboard.runs_by_player:
-            runId = leaderboard.runs_by_player[playerId]
-        if liteFormat:
-            args.chat.send(
-                speedruncom.messages_personal_best_lite(id, runId, args.chat))
-        else:
-            args.chat.send(
-                speedruncom.messages_personal_best(id, runId, args.chat))
+    if resolved.id is None:
+        return True
+
+    id: speedrundata.LeaderboardId = resolved.id
+    await speedruncom.load_leaderboard(id, args.timestamp,
+                                       channel=args.chat.channel)
+    if id not in speedruncom.leaderboards:
+        args.chat.send('speedrun.com is currently unavailable')
+        return True
+    leaderboard: speedrundata.Leaderboard = speedruncom.leaderboards[id]
+    runId: Optional[str] = leaderboard.personal_best(playerId)
+    if liteFormat:
+        args.chat.send(
+            speedruncom.messages_personal_best_lite(id, runId, args.chat))
+    else:
+        args.chat.send(
+            speedruncom.messages_personal_best(id, runId, args.chat))
     return True
 
 
@@ -172,21 +135,23 @@ change categories''')
 @permission('broadcaster')
 async def commandSpeedrunComUser(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
     if len(args.message) < 2:
-        async with DatabaseMain.acquire() as db:
+        async with speedruncom.acquire_database('write') as db:
             await speedruncom.clear_user(db, args.chat.channel)
         args.chat.send(
             f'Set the speedrun.com user for {args.chat.channel} to default')
     else:
         identifier: str = args.message.lower[1:]
-        await speedruncom.load_user(identifier, args.timestamp)
+        await speedruncom.load_user(identifier, args.timestamp,
+                                    args.chat.channel)
 
-        if speedruncom.playerLookup[identifier] is None:
+        if identifier not in speedruncom.playerLookup:
+            args.chat.send('speedrun.com is currently unavailable')
+        elif speedruncom.playerLookup[identifier] is None:
             args.chat.send(
                 f"Cannot find '{args.message.query}' on speedrun.com")
         else:
-            async with DatabaseMain.acquire() as db:
+            async with speedruncom.acquire_database('write') as db:
                 await speedruncom.set_user(db, args.chat.channel, identifier)
             args.chat.send(f'''\
 Set the speedrun.user for {args.chat.channel} to using {args.message.query}''')
@@ -197,9 +162,8 @@ Set the speedrun.user for {args.chat.channel} to using {args.message.query}''')
 @permission('moderator')
 async def commandSpeedrunComGame(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
     if len(args.message) < 2:
-        async with DatabaseMain.acquire() as db:
+        async with speedruncom.acquire_database('write') as db:
             await speedruncom.clear_game(db, args.chat.channel)
         args.chat.send(f'''\
 Set the game for !wr and !pb to {args.chat.channel} Twitch game \
@@ -207,16 +171,21 @@ Set the game for !wr and !pb to {args.chat.channel} Twitch game \
         return True
 
     search = args.message.lower[1:]
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        await speedruncom.load_game(args.chat, cursor, None, search,
-                                    args.timestamp)
+    await speedruncom.load_game(args.chat, None, search, args.timestamp)
 
-        if speedruncom.gameSearch[search] is None:
-            args.chat.send(f'''\
+    if search not in speedruncom.gameSearch:
+        args.chat.send('speedrun.com is currently unavailable')
+        return True
+    gameId: Optional[str] = speedruncom.gameSearch[search]
+    if gameId is None:
+        args.chat.send(f'''\
 Cannot find '{args.message.query}' on speedrun.com''')
-            return True
-        game: speedrundata.Game
-        game = speedruncom.games[speedruncom.gameSearch[search]]
+        return True
+    if gameId not in speedruncom.games:
+        args.chat.send('speedrun.com is currently unavailable')
+        return True
+    game: speedrundata.Game = speedruncom.games[gameId]
+    async with speedruncom.acquire_database('write') as db:
         await speedruncom.set_game(db, args.chat.channel, game.id)
     msg: str
     if (game.internationalName == search
@@ -235,13 +204,11 @@ best guess for !wr and !pb to {game.internationalName}'''
 @permission('moderator')
 async def commandSpeedrunComLevel(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    chanGameId: Optional[str]
+    _, chanGameId = await speedruncom.channel_config(args.chat)
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, None, args.timestamp)
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, None, args.timestamp)
 
     game: Optional[speedrundata.Game] = None
     if (searched in speedruncom.gameSearch
@@ -253,7 +220,8 @@ async def commandSpeedrunComLevel(args: ChatCommandArgs) -> bool:
         return True
 
     if len(args.message) < 2:
-        await speedruncom.clear_level(db, args.chat.channel, game.id)
+        async with speedruncom.acquire_database('write') as db:
+            await speedruncom.clear_level(db, args.chat.channel, game.id)
         args.chat.send(f'''\
 Set to full-game for !wr and !pb in the game '{game.internationalName}'\
 ''')
@@ -278,8 +246,9 @@ Set to full-game for !wr and !pb in the game '{game.internationalName}'\
 Cannot find individual level \
 '{game.internationalName} - {args.message.query}' on speedrun.com''')
         else:
-            await speedruncom.set_level(db, args.chat.channel, game.id,
-                                        levelId)
+            async with speedruncom.acquire_database('write') as db:
+                await speedruncom.set_level(db, args.chat.channel, game.id,
+                                            levelId)
             args.chat.send(f'''\
 Set the level to '{game.levels[levelId].name}' for !wr and !pb for the game \
 '{game.internationalName}'\
@@ -291,35 +260,34 @@ Set the level to '{game.levels[levelId].name}' for !wr and !pb for the game \
 @permission('moderator')
 async def commandSpeedrunComCategory(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    settings: speedrunsettings.ChannelSettings
+    chanGameId: Optional[str]
+    settings, chanGameId = await speedruncom.channel_config(args.chat)
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, None, args.timestamp)
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, None, args.timestamp)
 
-        game: Optional[speedrundata.Game] = None
-        if (searched in speedruncom.gameSearch
-                and speedruncom.gameSearch[searched] in speedruncom.games):
-            game = speedruncom.games[speedruncom.gameSearch[searched]]
+    game: Optional[speedrundata.Game] = None
+    if (searched in speedruncom.gameSearch
+            and speedruncom.gameSearch[searched] in speedruncom.games):
+        game = speedruncom.games[speedruncom.gameSearch[searched]]
 
-        if game is None:
-            args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
-            return True
+    if game is None:
+        args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
+        return True
 
-        categories: Dict[str, speedrundata.Category] = game.game_categories
+    categories: Dict[str, speedrundata.Category] = game.game_categories
 
-        levelText: str = ''
-        levelId: Optional[str] = await speedruncom.channel_levelid(
-            cursor, args.chat, game.id)
-        if levelId is not None and levelId in game.levels:
-            levelText = f' - {game.levels[levelId].name}'
-            categories = game.levels[levelId].categories
+    levelText: str = ''
+    levelId: Optional[str] = settings.levelid(game.id)
+    if levelId is not None and levelId in game.levels:
+        levelText = f' - {game.levels[levelId].name}'
+        categories = game.levels[levelId].categories
 
     if len(args.message) < 2:
-        await speedruncom.clear_category(db, args.chat.channel, game.id,
-                                         levelId)
+        async with speedruncom.acquire_database('write') as db:
+            await speedruncom.clear_category(db, args.chat.channel, game.id,
+                                             levelId)
         categoryId: Optional[str] = speedruncom.default_categoryid(categories)
         if categoryId is None:
             args.chat.send(f'''\
@@ -347,8 +315,9 @@ Set category to default '{category.name}' for !wr and !pb in \
 Cannot find category \
 '{game.internationalName}{levelText} - {categorySearch}' on speedrun.com''')
         else:
-            await speedruncom.set_category(db, args.chat.channel, game.id,
-                                           levelId, searchCategoryId)
+            async with speedruncom.acquire_database('write') as db:
+                await speedruncom.set_category(db, args.chat.channel, game.id,
+                                               levelId, searchCategoryId)
             name: str = categories[searchCategoryId].name
             args.chat.send(f'''\
 Set the category to '{name}' for !wr and !pb for the game \
@@ -361,55 +330,54 @@ Set the category to '{name}' for !wr and !pb for the game \
 @permission('moderator')
 async def commandSpeedrunComSubCategory(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    settings: speedrunsettings.ChannelSettings
+    chanGameId: Optional[str]
+    settings, chanGameId = await speedruncom.channel_config(args.chat)
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, None, args.timestamp)
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, None, args.timestamp)
 
-        game: Optional[speedrundata.Game] = None
-        if (searched in speedruncom.gameSearch
-                and speedruncom.gameSearch[searched] in speedruncom.games):
-            game = speedruncom.games[speedruncom.gameSearch[searched]]
+    game: Optional[speedrundata.Game] = None
+    if (searched in speedruncom.gameSearch
+            and speedruncom.gameSearch[searched] in speedruncom.games):
+        game = speedruncom.games[speedruncom.gameSearch[searched]]
 
-        if game is None:
-            args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
-            return True
+    if game is None:
+        args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
+        return True
 
-        categories: Dict[str, speedrundata.Category] = game.game_categories
+    categories: Dict[str, speedrundata.Category] = game.game_categories
 
-        levelText: str = ''
-        levelId: Optional[str] = await speedruncom.channel_levelid(
-            cursor, args.chat, game.id)
-        if levelId is not None and levelId in game.levels:
-            levelText = f' - {game.levels[levelId].name}'
-            categories = game.levels[levelId].categories
+    levelText: str = ''
+    levelId: Optional[str] = settings.levelid(game.id)
+    if levelId is not None and levelId in game.levels:
+        levelText = f' - {game.levels[levelId].name}'
+        categories = game.levels[levelId].categories
 
-        categoryId: Optional[str] = await speedruncom.channel_categoryid(
-            cursor, args.chat, game.id, levelId)
-        if categoryId is None:
-            categoryId = speedruncom.default_categoryid(categories)
-        if categoryId not in categories:
-            args.chat.send(f'''\
+    categoryId: Optional[str] = settings.categoryid(game.id, levelId)
+    if categoryId is None:
+        categoryId = speedruncom.default_categoryid(categories)
+    if categoryId not in categories:
+        args.chat.send(f'''\
 Cannot find category for '{game.internationalName}'. Use !wrcategory to \
 change categories''')
-        category: speedrundata.Category = categories[categoryId]
+    category: speedrundata.Category = categories[categoryId]
 
-        variables: Dict[str, str] = speedruncom.default_sub_categories(
-            game, levelId, categoryId)
+    variables: Dict[str, str] = speedruncom.default_sub_categories(
+        game, levelId, categoryId)
 
     variable: speedrundata.Variable
     variableId: str
     if len(args.message) < 2:
         values = []
-        for variableId in variables:
-            await speedruncom.clear_variable(
-                db, args.chat.channel, game.id, levelId, categoryId,
-                variableId)
-            variable = speedruncom.variables[variableId]
-            values.append(variable.values[variable.default])
+        async with speedruncom.acquire_database('write') as db:
+            for variableId in variables:
+                await speedruncom.clear_variable(
+                    db, args.chat.channel, game.id, levelId, categoryId,
+                    variableId)
+                variable = speedruncom.variables[variableId]
+                if variable.default is not None:
+                    values.append(variable.values[variable.default])
         default_subcategories: str = ', '.join(values)
         args.chat.send(f'''\
 Set subcategories to default '{default_subcategories}' for !wr and !pb in \
@@ -437,9 +405,10 @@ Cannot find variable value matching '{args.message.query}' for \
 '{game.internationalName}{levelText} - {category.name}' on speedrun.com''')
         else:
             variable = speedruncom.variables[searchVariableId]
-            await speedruncom.set_variable(db, args.chat.channel, game.id,
-                                           levelId, categoryId,
-                                           searchVariableId, searchValue)
+            async with speedruncom.acquire_database('write') as db:
+                await speedruncom.set_variable(db, args.chat.channel, game.id,
+                                               levelId, categoryId,
+                                               searchVariableId, searchValue)
             args.chat.send(f'''\
 Set the variable '{variable.name}' to '{args.message.query}' \
 for !wr and !pb for \
@@ -452,53 +421,51 @@ for !wr and !pb for \
 @permission('moderator')
 async def commandSpeedrunComVariable(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    settings: speedrunsettings.ChannelSettings
+    chanGameId: Optional[str]
+    settings, chanGameId = await speedruncom.channel_config(args.chat)
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, None, args.timestamp)
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, None, args.timestamp)
 
-        game: Optional[speedrundata.Game] = None
-        if (searched in speedruncom.gameSearch
-                and speedruncom.gameSearch[searched] in speedruncom.games):
-            game = speedruncom.games[speedruncom.gameSearch[searched]]
+    game: Optional[speedrundata.Game] = None
+    if (searched in speedruncom.gameSearch
+            and speedruncom.gameSearch[searched] in speedruncom.games):
+        game = speedruncom.games[speedruncom.gameSearch[searched]]
 
-        if game is None:
-            args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
-            return True
+    if game is None:
+        args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
+        return True
 
-        categories: Dict[str, speedrundata.Category] = game.game_categories
+    categories: Dict[str, speedrundata.Category] = game.game_categories
 
-        levelText: str = ''
-        levelId: Optional[str] = await speedruncom.channel_levelid(
-            cursor, args.chat, game.id)
-        if levelId is not None and levelId in game.levels:
-            levelText = ' - ' + game.levels[levelId].name
-            categories = game.levels[levelId].categories
+    levelText: str = ''
+    levelId: Optional[str] = settings.levelid(game.id)
+    if levelId is not None and levelId in game.levels:
+        levelText = ' - ' + game.levels[levelId].name
+        categories = game.levels[levelId].categories
 
-        categoryId: Optional[str] = await speedruncom.channel_categoryid(
-            cursor, args.chat, game.id, levelId)
-        if categoryId is None:
-            categoryId = speedruncom.default_categoryid(categories)
-        if categoryId not in categories:
-            args.chat.send(f'''\
+    categoryId: Optional[str] = settings.categoryid(game.id, levelId)
+    if categoryId is None:
+        categoryId = speedruncom.default_categoryid(categories)
+    if categoryId not in categories:
+        args.chat.send(f'''\
 Cannot find category for '{game.internationalName}'. Use !wrcategory to \
 change categories''')
-        category: speedrundata.Category = categories[categoryId]
+    category: speedrundata.Category = categories[categoryId]
 
-        variables: List[speedrundata.Variable]
-        variables = [v for v
-                     in speedruncom.valid_variables(game, levelId, categoryId)
-                     if not v.sub_category]
+    variables: List[speedrundata.Variable]
+    variables = [v for v
+                 in speedruncom.valid_variables(game, levelId, categoryId)
+                 if not v.sub_category]
 
     variable: speedrundata.Variable
     if len(args.message) < 2:
-        for variable in variables:
-            await speedruncom.clear_variable(
-                db, args.chat.channel, game.id, levelId, categoryId,
-                variable.id)
+        async with speedruncom.acquire_database('write') as db:
+            for variable in variables:
+                await speedruncom.clear_variable(
+                    db, args.chat.channel, game.id, levelId, categoryId,
+                    variable.id)
         args.chat.send(f'''\
 Reverted all variables to any value for !wr and !pb in \
 '{game.internationalName}{levelText} - {category.name}'\
@@ -525,9 +492,10 @@ Cannot find variable value matching '{args.message.query}' for \
  on speedrun.com''')
         else:
             variable = speedruncom.variables[searchVariableId]
-            await speedruncom.set_variable(db, args.chat.channel, game.id,
-                                           levelId, categoryId,
-                                           searchVariableId, searchValue)
+            async with speedruncom.acquire_database('write') as db:
+                await speedruncom.set_variable(db, args.chat.channel, game.id,
+                                               levelId, categoryId,
+                                               searchVariableId, searchValue)
             args.chat.send(f'''\
 Set the variable '{variable.name}' to '{args.message.query}' \
 for !wr and !pb for \
@@ -540,13 +508,11 @@ for !wr and !pb for \
 @permission('moderator')
 async def commandSpeedrunComRegion(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    chanGameId: Optional[str]
+    _, chanGameId = await speedruncom.channel_config(args.chat)
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, None, args.timestamp)
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, None, args.timestamp)
 
     game: Optional[speedrundata.Game] = None
     if (searched in speedruncom.gameSearch
@@ -558,7 +524,8 @@ async def commandSpeedrunComRegion(args: ChatCommandArgs) -> bool:
         return True
 
     if len(args.message) < 2:
-        speedruncom.clear_region(db, args.chat.channel, game.id)
+        async with speedruncom.acquire_database('write') as db:
+            await speedruncom.clear_region(db, args.chat.channel, game.id)
         args.chat.send(f'''\
 Set to any region for !wr and !pb in the game '{game.internationalName}'\
 ''')
@@ -577,8 +544,9 @@ Set to any region for !wr and !pb in the game '{game.internationalName}'\
 Cannot find individual region '{args.message.query}' for '{game}' on \
 speedrun.com''')
         else:
-            await speedruncom.set_region(db, args.chat.channel,
-                                         game.id, regionId)
+            async with speedruncom.acquire_database('write') as db:
+                await speedruncom.set_region(db, args.chat.channel,
+                                             game.id, regionId)
             args.chat.send(f'''\
 Set the region to '{speedruncom.regions[regionId].name}' for !wr and !pb for \
 the game '{game.internationalName}'\
@@ -590,13 +558,11 @@ the game '{game.internationalName}'\
 @permission('moderator')
 async def commandSpeedrunComPlatform(args: ChatCommandArgs) -> bool:
     db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    chanGameId: Optional[str]
+    _, chanGameId = await speedruncom.channel_config(args.chat)
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, None, args.timestamp)
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, None, args.timestamp)
 
     game: Optional[speedrundata.Game] = None
     if (searched in speedruncom.gameSearch
@@ -608,7 +574,8 @@ async def commandSpeedrunComPlatform(args: ChatCommandArgs) -> bool:
         return True
 
     if len(args.message) < 2:
-        await speedruncom.clear_platform(db, args.chat.channel, game.id)
+        async with speedruncom.acquire_database('write') as db:
+            await speedruncom.clear_platform(db, args.chat.channel, game.id)
         args.chat.send(f'''\
 Set to any platform for !wr and !pb in the game '{game.internationalName}'\
 ''')
@@ -627,8 +594,9 @@ Set to any platform for !wr and !pb in the game '{game.internationalName}'\
 Cannot find individual platform '{args.message.query}' for '{game}' on \
 speedrun.com''')
         else:
-            await speedruncom.set_platform(db, args.chat.channel, game.id,
-                                           platformId)
+            async with speedruncom.acquire_database('write') as db:
+                await speedruncom.set_platform(db, args.chat.channel, game.id,
+                                               platformId)
             args.chat.send(f'''\
 Set the platform to '{speedruncom.platforms[platformId].name}' \
 for !wr and !pb for the game '{game.internationalName}'\
@@ -639,46 +607,43 @@ for !wr and !pb for the game '{game.internationalName}'\
 @feature('speedrun.com')
 @cooldown(timedelta(seconds=60), 'leaderboard', 'owner')
 async def commandLeaderboard(args: ChatCommandArgs) -> bool:
-    db: DatabaseMain
-    cursor: aioodbc.cursor.Cursor
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        chanGameId: Optional[str]
-        chanGameId = await speedruncom.channel_gameid(cursor, args.chat)
+    settings: speedrunsettings.ChannelSettings
+    chanGameId: Optional[str]
+    settings, chanGameId = await speedruncom.channel_config(
+        args.chat, args.message.query)
+
+    searched: str = await speedruncom.load_game(
+        args.chat, chanGameId, args.message.query, args.timestamp)
+
+    game: Optional[speedrundata.Game] = None
+    if (searched in speedruncom.gameSearch
+            and speedruncom.gameSearch[searched] in speedruncom.games):
+        game = speedruncom.games[speedruncom.gameSearch[searched]]
 
-        searched: str = await speedruncom.load_game(
-            args.chat, cursor, chanGameId, args.message.query, args.timestamp)
+    if game is None:
+        args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
+        return True
+    categories: Dict[str, speedrundata.Category] = game.game_categories
 
-        game: Optional[speedrundata.Game] = None
-        if (searched in speedruncom.gameSearch
-                and speedruncom.gameSearch[searched] in speedruncom.games):
-            game = speedruncom.games[speedruncom.gameSearch[searched]]
+    level: speedrundata.Level = None
+    levelId: Optional[str] = settings.levelid(game.id)
+    if levelId is not None and levelId in game.levels:
+        level = game.levels[levelId]
+        categories = level.categories
 
-        if game is None:
-            args.chat.send(f"Cannot find game '{searched}' on speedrun.com")
-            return True
-        categories: Dict[str, speedrundata.Category] = game.game_categories
-
-        level: speedrundata.Level = None
-        levelId: Optional[str] = await speedruncom.channel_levelid(
-            cursor, args.chat, game.id)
-        if levelId is not None and levelId in game.levels:
-            level = game.levels[levelId]
-            categories = level.categories
-
-        categoryId: Optional[str] = await speedruncom.channel_categoryid(
-            cursor, args.chat, game.id, levelId)
-        if categoryId is None or categoryId not in categories:
-            if level is None:
-                args.chat.send(
-                    f'{game.internationalName} Leaderboard: {game.weblink}')
-            else:
-                args.chat.send(f'''\
+    categoryId: Optional[str] = settings.categoryid(game.id, levelId)
+    if categoryId is None or categoryId not in categories:
+        if level is None:
+            args.chat.send(
+                f'{game.internationalName} Leaderboard: {game.weblink}')
+        else:
+            args.chat.send(f'''\
 {game.internationalName} - {level.name} Leaderboard: {level.weblink}''')
-            return True
-        category: speedrundata.Category = categories[categoryId]
+        return True
+    category: speedrundata.Category = categories[categoryId]
 
-        levelText: str = f'{level.name} - ' if level is not None else ''
-        args.chat.send(f'''\
+    levelText: str = f'{level.name} - ' if level is not None else ''
+    args.chat.send(f'''\
 {game.internationalName} - {levelText}{category.name} Leaderboard: \
 {category.weblink}''')
     return True
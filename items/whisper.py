@@ -9,6 +9,8 @@ def commands() -> Mapping[str, Optional[WhisperCommand]]:
     if not hasattr(commands, 'commands'):
         setattr(commands, 'commands', {
             '!reloadspeedrun': whisper.commandReloadSpeedrun,
+            '!speedrunstats': whisper.commandSpeedrunStats,
+            '!speedrunqueue': whisper.commandSpeedrunQueue,
         })
     return getattr(commands, 'commands')
 
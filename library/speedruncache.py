@@ -0,0 +1,375 @@
+﻿import hashlib
+import heapq
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple  # noqa: F401,E501
+
+
+class CachedResponse:
+    def __init__(self,
+                 url: str,
+                 etag: Optional[str],
+                 lastModified: Optional[str],
+                 length: int) -> None:
+        self.url: str = url
+        self.etag: Optional[str] = etag
+        self.lastModified: Optional[str] = lastModified
+        self.length: int = length
+
+
+class ResponseCache:
+    def __init__(self, directory: str, limit: int) -> None:
+        self.directory: str = directory
+        self.limit: int = limit
+        self.entries: LruDict = LruDict(limit)
+        self.digests: LruDict = LruDict(limit)
+        self.removed: Set[str] = set()
+        self.notModified: int = 0
+        self.bytesSaved: int = 0
+        self.parsesSaved: int = 0
+
+    def path(self, url: str) -> str:
+        name: str = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.json')
+
+    def paths(self) -> Set[str]:
+        return set(self.path(url) for url in self.entries)
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        if url not in self.entries:
+            return None
+        self.entries.touch(url)
+        return self.entries[url]
+
+    # load, read, write, remove and prune block on the disk; run them in an
+    # executor
+    def load(self, url: str) -> Optional[CachedResponse]:
+        try:
+            with open(self.path(url), 'rb') as file:
+                header: Dict[str, Any] = json.loads(file.readline())
+        except (OSError, ValueError):
+            return None
+        if header.get('url') != url:
+            return None
+        return CachedResponse(
+            url, header['etag'], header['lastModified'], header['length'])
+
+    def add(self, entry: CachedResponse) -> None:
+        self.entries[entry.url] = entry
+        self.removed.discard(entry.url)
+        key: Hashable
+        for key, _ in self.entries.evict():
+            self.removed.add(str(key))
+
+    def validators(self, entry: CachedResponse) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry.etag is not None:
+            headers['If-None-Match'] = entry.etag
+        if entry.lastModified is not None:
+            headers['If-Modified-Since'] = entry.lastModified
+        return headers
+
+    def read(self, entry: CachedResponse) -> Optional[bytes]:
+        try:
+            with open(self.path(entry.url), 'rb') as file:
+                file.readline()
+                return file.read()
+        except OSError:
+            return None
+
+    def not_modified(self, entry: CachedResponse, parsed: bool) -> None:
+        self.notModified += 1
+        self.bytesSaved += entry.length
+        if not parsed:
+            self.parsesSaved += 1
+
+    def store(self,
+              url: str,
+              etag: Optional[str],
+              lastModified: Optional[str],
+              body: bytes) -> Optional[CachedResponse]:
+        if etag is None and lastModified is None:
+            self.discard(url)
+            return None
+        entry: CachedResponse = CachedResponse(url, etag, lastModified,
+                                               len(body))
+        self.add(entry)
+        return entry
+
+    def write(self,
+              entry: CachedResponse,
+              body: bytes) -> None:
+        header: Dict[str, Any] = {
+            'url': entry.url,
+            'etag': entry.etag,
+            'lastModified': entry.lastModified,
+            'length': entry.length,
+            }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(entry.url), 'wb') as file:
+                file.write(json.dumps(header).encode('utf-8') + b'\n')
+                file.write(body)
+        except OSError:
+            pass
+
+    def fingerprint(self, url: str, body: bytes) -> None:
+        self.digests[url] = hashlib.sha1(body).digest()
+        self.digests.evict()
+
+    def digest(self, url: str) -> Optional[bytes]:
+        return self.digests.get(url)
+
+    def discard(self, url: str) -> None:
+        self.entries.pop(url, None)
+        self.digests.pop(url, None)
+        self.removed.add(url)
+
+    def removals(self) -> List[str]:
+        urls: List[str] = list(self.removed)
+        self.removed.clear()
+        return urls
+
+    def remove(self, urls: List[str]) -> None:
+        url: str
+        for url in urls:
+            try:
+                os.remove(self.path(url))
+            except OSError:
+                pass
+
+    def prune(self, keep: Set[str]) -> None:
+        # Files from earlier runs are never evicted from memory, so cap the
+        # directory itself, dropping the least recently written first
+        try:
+            names: List[str] = os.listdir(self.directory)
+        except OSError:
+            return
+        if len(names) <= self.limit:
+            return
+        files: List[Tuple[float, str]] = []
+        name: str
+        for name in names:
+            path: str = os.path.join(self.directory, name)
+            if path in keep:
+                continue
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        files.sort()
+        for _, path in files[:len(names) - self.limit]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.digests.clear()
+
+
+class Fingerprints:
+    def __init__(self) -> None:
+        self.digests: Dict[Tuple[str, Hashable], bytes] = {}
+        self.checked: Dict[str, int] = {}
+        self.skipped: Dict[str, int] = {}
+
+    def unchanged(self,
+                  kind: str,
+                  key: Hashable,
+                  digest: Optional[bytes]) -> bool:
+        self.checked[kind] = self.checked.get(kind, 0) + 1
+        if not self.matches(kind, key, digest):
+            return False
+        self.skipped[kind] = self.skipped.get(kind, 0) + 1
+        return True
+
+    def matches(self,
+                kind: str,
+                key: Hashable,
+                digest: Optional[bytes]) -> bool:
+        return digest is not None and self.digests.get((kind, key)) == digest
+
+    def record(self,
+               kind: str,
+               key: Hashable,
+               digest: Optional[bytes]) -> None:
+        if digest is None:
+            self.digests.pop((kind, key), None)
+        else:
+            self.digests[kind, key] = digest
+
+    def discard(self, kind: str, key: Hashable) -> None:
+        self.digests.pop((kind, key), None)
+
+    def clear(self) -> None:
+        self.digests.clear()
+
+
+class MessageCache:
+    def __init__(self) -> None:
+        self.entries: Dict[Hashable, Dict[Hashable, List[str]]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return sum(len(e) for e in self.entries.values())
+
+    def get(self,
+            group: Hashable,
+            key: Hashable,
+            render: Callable[[], Iterable[str]]) -> List[str]:
+        if group in self.entries and key in self.entries[group]:
+            self.hits += 1
+            return self.entries[group][key]
+        self.misses += 1
+        messages: List[str] = list(render())
+        self.entries.setdefault(group, {})[key] = messages
+        return messages
+
+    def invalidate(self, group: Hashable) -> None:
+        self.entries.pop(group, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> None:
+        group: Hashable
+        for group in [g for g in self.entries if predicate(g)]:
+            del self.entries[group]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class LruDict(OrderedDict):
+    def __init__(self, limit: int) -> None:
+        super().__init__()
+        self.limit: int = limit
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+
+    def touch(self, key: Hashable) -> None:
+        if key in self:
+            self.move_to_end(key)
+
+    def evict(self) -> List[Tuple[Hashable, Any]]:
+        evicted: List[Tuple[Hashable, Any]] = []
+        while len(self) > self.limit:
+            evicted.append(self.popitem(last=False))
+        return evicted
+
+
+class TimestampCache(dict):
+    def __init__(self, kinds: Iterable[str]) -> None:
+        super().__init__()
+        self.heaps: Dict[str, List[Tuple[datetime, int, Hashable]]]
+        self.heaps = {kind: [] for kind in kinds}
+        self.sizes: Dict[str, int] = {kind: 0 for kind in self.heaps}
+        self.parked: Set[Tuple[str, Hashable]] = set()
+        self.counter: int = 0
+
+    def __setitem__(self,
+                    key: Tuple[str, Hashable],
+                    timestamp: datetime) -> None:
+        kind: str = key[0]
+        if kind not in self.heaps:
+            super().__setitem__(key, timestamp)
+            return
+        if key in self:
+            if self[key] == timestamp and key not in self.parked:
+                return
+        else:
+            self.sizes[kind] += 1
+        super().__setitem__(key, timestamp)
+        self.parked.discard(key)
+        self.push(kind, key[1], timestamp)
+
+    def __delitem__(self, key: Tuple[str, Hashable]) -> None:
+        super().__delitem__(key)
+        if key[0] in self.heaps:
+            self.sizes[key[0]] -= 1
+            self.parked.discard(key)
+
+    def pop(self, key: Tuple[str, Hashable], *default: Any) -> Any:
+        if key not in self:
+            return super().pop(key, *default)
+        value: Any = self[key]
+        del self[key]
+        return value
+
+    def clear(self) -> None:
+        super().clear()
+        kind: str
+        for kind in self.heaps:
+            self.heaps[kind].clear()
+            self.sizes[kind] = 0
+        self.parked.clear()
+
+    def push(self,
+             kind: str,
+             id: Hashable,
+             timestamp: datetime) -> None:
+        heap: List[Tuple[datetime, int, Hashable]] = self.heaps[kind]
+        self.counter += 1
+        heapq.heappush(heap, (timestamp, self.counter, id))
+        if len(heap) > self.sizes[kind] * 2 + 64:
+            self.compact(kind)
+
+    def valid(self,
+              kind: str,
+              id: Hashable,
+              timestamp: datetime) -> bool:
+        key: Tuple[str, Hashable] = kind, id
+        return key not in self.parked and self.get(key) == timestamp
+
+    def compact(self, kind: str) -> None:
+        heap: List[Tuple[datetime, int, Hashable]] = self.heaps[kind]
+        heap[:] = [e for e in heap if self.valid(kind, e[2], e[0])]
+        heapq.heapify(heap)
+
+    def oldest(self, kind: str) -> Optional[Tuple[Hashable, datetime]]:
+        heap: List[Tuple[datetime, int, Hashable]] = self.heaps[kind]
+        while heap:
+            timestamp: datetime
+            id: Hashable
+            timestamp, _, id = heap[0]
+            if self.valid(kind, id, timestamp):
+                return id, timestamp
+            heapq.heappop(heap)
+        return None
+
+    def expired(self,
+                kind: str,
+                before: datetime) -> List[Tuple[Hashable, datetime]]:
+        heap: List[Tuple[datetime, int, Hashable]] = self.heaps[kind]
+        found: Dict[Hashable, datetime] = {}
+        pending: List[int] = [0]
+        while pending:
+            index: int = pending.pop()
+            if index >= len(heap) or heap[index][0] > before:
+                continue
+            timestamp: datetime
+            id: Hashable
+            timestamp, _, id = heap[index]
+            if self.valid(kind, id, timestamp):
+                found[id] = timestamp
+            pending.append(index * 2 + 1)
+            pending.append(index * 2 + 2)
+        return list(found.items())
+
+    def park(self,
+             kind: str,
+             id: Hashable) -> None:
+        if (kind, id) in self:
+            self.parked.add((kind, id))
+
+    def reschedule(self,
+                   kind: str,
+                   id: Hashable) -> None:
+        key: Tuple[str, Hashable] = kind, id
+        if key in self.parked:
+            self.parked.discard(key)
+            self.push(kind, id, self[key])
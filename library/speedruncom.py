@@ -1,25 +1,51 @@
-﻿import urllib.parse
-from datetime import datetime
-from typing import Any, Dict, Generator, List, Optional, Set, Tuple, Union  # noqa: F401,E501
+﻿import asyncio
+import json
+import os
+import pickle
+import traceback
+import urllib.parse
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Generator, Hashable, List, Optional, Set, Tuple, Union, cast  # noqa: F401,E501
 
 import aiohttp
 import aioodbc.cursor
 
 import bot
-from bot import data, utils  # noqa: F401
+from bot import data, globals, utils  # noqa: F401
 from bot.coroutine import logging
 from lib.helper import message
 from lib.data import Send
 from lib.database import DatabaseMain
-from . import speedrundata
+from . import speedruncache, speedrundata, speedrunrefresh, speedrunrequest
+from . import speedrunsettings
 
 dateFormat = '%b %d, %Y'
+queryBatchSize: int = 500
 
-cache: Dict[Tuple[str, Union[speedrundata.LeaderboardId, str]], datetime] = {}
+leaderboardCacheDuration: timedelta = timedelta(minutes=60)
+cacheDuration: timedelta = timedelta(hours=24)
+leaderboardMaxStaleness: timedelta = timedelta(hours=12)
+maxStaleness: timedelta = timedelta(days=7)
+
+if bot.config.development:
+    leaderboardCacheDuration = timedelta(minutes=5)
+    cacheDuration = timedelta(minutes=30)
+
+cache: speedruncache.TimestampCache = speedruncache.TimestampCache(
+    ['leaderboards', 'games', 'gameSearch', 'playerLookup', 'platforms',
+     'regions'])
 leaderboardRequest: Dict[speedrundata.LeaderboardId, datetime] = {}
+refreshDemand: speedrunrefresh.Demand = speedrunrefresh.Demand(
+    timedelta(minutes=30))
+
+leaderboardLimit: int = 1000
+playerLookupLimit: int = 20000
+minimumRunSweep: int = 10000
+runsAfterSweep: int = 0
 
 twitchPlayer: Dict[str, Optional[str]] = {}
-playerLookup: Dict[str, Optional[str]] = {}
+playerLookup: speedruncache.LruDict = speedruncache.LruDict(playerLookupLimit)
 gameSearch: Dict[str, Optional[str]] = {}
 bestSearch: Dict[str, Optional[str]] = {}
 
@@ -31,7 +57,97 @@ categories: Dict[str, speedrundata.Category] = {}
 variables: Dict[str, speedrundata.Variable] = {}
 players: Dict[str, speedrundata.Player] = {}
 runs: Dict[str, speedrundata.Run] = {}
-leaderboards: Dict[speedrundata.LeaderboardId, speedrundata.Leaderboard] = {}
+leaderboards: speedruncache.LruDict = speedruncache.LruDict(leaderboardLimit)
+messageCache: speedruncache.MessageCache = speedruncache.MessageCache()
+payloadFingerprints: speedruncache.Fingerprints = speedruncache.Fingerprints()
+
+LeaderboardListener = Callable[
+    [speedrundata.LeaderboardId, List[speedrundata.LeaderboardChange]], None]
+leaderboardListeners: List[LeaderboardListener] = []
+leaderboardChanges: Dict[str, int] = {}
+
+connectionLimit: int = 16
+connectionLimitPerHost: int = 8
+keepAliveTimeout: float = 60
+dnsCacheTimeout: int = 600
+
+session: Optional[aiohttp.ClientSession] = None
+callLimit: int = 90
+callDuration: timedelta = timedelta(minutes=1)
+
+if 'srcRateLimiter' not in globals.globalSessionData:
+    globals.globalSessionData['srcRateLimiter'] = speedrunrequest.TokenBucket(
+        callLimit, callDuration)
+rateLimiter: speedrunrequest.TokenBucket
+rateLimiter = globals.globalSessionData['srcRateLimiter']
+reservedCalls: int = 15
+interactiveDeadline: float = 10
+backgroundDeadline: float = 60
+requestScheduler: speedrunrequest.RequestScheduler
+requestScheduler = speedrunrequest.RequestScheduler(rateLimiter, reservedCalls)
+
+interactiveRetries: int = 1
+backgroundRetries: int = 3
+apiBackoff: speedrunrequest.Backoff = speedrunrequest.Backoff(1, 120)
+circuitBreaker: speedrunrequest.CircuitBreaker
+circuitBreaker = speedrunrequest.CircuitBreaker(5, 60)
+
+requestFlights: speedrunrequest.SingleFlight = speedrunrequest.SingleFlight()
+# Returned when speedrun.com could not be asked; {} means it had nothing
+apiUnavailable: Dict[str, Any] = {}
+# Returned on a 304 whose body was already parsed into the fingerprinted key
+apiUnchanged: Dict[str, Any] = {}
+refreshFlights: speedrunrequest.SingleFlight = speedrunrequest.SingleFlight()
+
+responseLimit: int = 4096
+responseCache: speedruncache.ResponseCache = speedruncache.ResponseCache(
+    os.path.join('cache', 'speedruncom'), responseLimit)
+
+settingsDuration: timedelta = timedelta(minutes=10)
+settingsCache: speedrunsettings.SettingsCache
+settingsCache = speedrunsettings.SettingsCache(settingsDuration)
+twitchGameCache: speedrunsettings.TwitchGameCache
+twitchGameCache = speedrunsettings.TwitchGameCache(settingsDuration)
+poolUsage: speedrunsettings.PoolUsage = speedrunsettings.PoolUsage()
+resolvedLeaderboards: Dict[str, speedrunsettings.ResolvedLeaderboard] = {}
+
+snapshotFile: str = os.path.join('cache', 'speedruncom.snapshot')
+snapshotVersion: int = 8
+
+
+def acquire_database(name: str) -> speedrunsettings.TimedAcquire:
+    return speedrunsettings.TimedAcquire(poolUsage, name, DatabaseMain.acquire)
+
+
+async def channel_config(chat: 'data.Channel',
+                         search: Optional[str]=None
+                         ) -> Tuple[speedrunsettings.ChannelSettings,
+                                    Optional[str]]:
+    settings: Optional[speedrunsettings.ChannelSettings]
+    settings = settingsCache.get(chat.channel)
+    gameId: Optional[str] = settings.game if settings is not None else None
+    twitchCached: bool = False
+    if gameId is None and not search and chat.twitchGame:
+        twitchCached, gameId = twitchGameCache.get(chat.twitchGame)
+    if settings is None or (gameId is None and not twitchCached
+                            and not search and chat.twitchGame):
+        db: DatabaseMain
+        cursor: aioodbc.cursor.Cursor
+        async with acquire_database('config') as db, \
+                await db.cursor() as cursor:
+            if settings is None:
+                generation: int = settingsCache.generation
+                loaded: Dict[str, speedrunsettings.ChannelSettings]
+                loaded = await query_channels_settings(cursor, [chat.channel])
+                settings = loaded[chat.channel]
+                settingsCache.store(settings, generation)
+                if settings.game is not None:
+                    gameId = settings.game
+            if (gameId is None and not twitchCached and not search
+                    and chat.twitchGame):
+                gameId = await twitch_gameid(cursor, chat.twitchGame)
+                twitchGameCache.store(chat.twitchGame, gameId)
+    return settings, gameId
 
 
 async def channels_active(cursor: aioodbc.cursor.Cursor) -> List[str]:
@@ -40,44 +156,35 @@ async def channels_active(cursor: aioodbc.cursor.Cursor) -> List[str]:
     return [r[0] async for r in cursor]
 
 
+async def channel_settings(cursor: aioodbc.cursor.Cursor,
+                           chat: 'data.Channel'
+                           ) -> speedrunsettings.ChannelSettings:
+    settings: Dict[str, speedrunsettings.ChannelSettings]
+    settings = await channels_settings(cursor, [chat.channel])
+    return settings[chat.channel]
+
+
 async def channel_user(cursor: aioodbc.cursor.Cursor,
                        chat: 'data.Channel') -> str:
-    query: str = 'SELECT userid FROM speedruncom_user WHERE broadcaster=?'
-    await cursor.execute(query, (chat.channel,))
-    row: Optional[Tuple[str]] = await cursor.fetchone()
-    return row[0] if row is not None else chat.channel
+    return (await channel_settings(cursor, chat)).userid()
 
 
 async def channel_gameid(cursor: aioodbc.cursor.Cursor,
                          chat: 'data.Channel') -> Optional[str]:
-    query: str = 'SELECT game FROM speedruncom_game WHERE broadcaster=?'
-    await cursor.execute(query, (chat.channel,))
-    row: Optional[Tuple[str]] = await cursor.fetchone()
-    return row[0] if row is not None else None
+    return (await channel_settings(cursor, chat)).game
 
 
 async def channel_levelid(cursor: aioodbc.cursor.Cursor,
                           chat: 'data.Channel',
                           gameid: str) -> Optional[str]:
-    query: str = '''
-SELECT level FROM speedruncom_level WHERE broadcaster=? AND game=?
-'''
-    await cursor.execute(query, (chat.channel, gameid))
-    row: Optional[Tuple[str]] = await cursor.fetchone()
-    return row[0] if row is not None and row[0] else None
+    return (await channel_settings(cursor, chat)).levelid(gameid)
 
 
 async def channel_categoryid(cursor: aioodbc.cursor.Cursor,
                              chat: 'data.Channel',
                              gameid: str,
                              levelid: Optional[str]) -> Optional[str]:
-    query: str = '''
-SELECT category FROM speedruncom_category
-    WHERE broadcaster=? AND game=? AND level=?
-'''
-    await cursor.execute(query, (chat.channel, gameid, levelid or ''))
-    row: Optional[Tuple[str]] = await cursor.fetchone()
-    return row[0] if row is not None else None
+    return (await channel_settings(cursor, chat)).categoryid(gameid, levelid)
 
 
 async def channel_variable(cursor: aioodbc.cursor.Cursor,
@@ -86,16 +193,10 @@ async def channel_variable(cursor: aioodbc.cursor.Cursor,
                            levelid: Optional[str],
                            categoryid: Optional[str],
                            variableid: str) -> Optional[str]:
-    query: str = '''
-SELECT value FROM speedruncom_variable
-    WHERE broadcaster=? AND game=? AND level=? AND category=?
-        AND variable=?
-'''
-    params: Tuple[Any, ...]
-    params = chat.channel, gameid, levelid or '', categoryid or '', variableid
-    await cursor.execute(query, params)
-    row: Optional[Tuple[str]] = await cursor.fetchone()
-    return row[0] if row is not None else None
+    settings: speedrunsettings.ChannelSettings
+    settings = await channel_settings(cursor, chat)
+    return settings.variable_values(gameid, levelid, categoryid).get(
+        variableid)
 
 
 async def channel_variables(cursor: aioodbc.cursor.Cursor,
@@ -103,30 +204,29 @@ async def channel_variables(cursor: aioodbc.cursor.Cursor,
                             gameid: str,
                             levelid: Optional[str],
                             categoryid: Optional[str]) -> Dict[str, str]:
-    query: str = '''
-SELECT variable, value FROM speedruncom_variable
-    WHERE broadcaster=? AND game=? AND level=? AND category=?
-'''
+    return channel_variable_values(await channel_settings(cursor, chat),
+                                   gameid, levelid, categoryid)
+
+
+def channel_variable_values(settings: speedrunsettings.ChannelSettings,
+                            gameid: str,
+                            levelid: Optional[str],
+                            categoryid: Optional[str]) -> Dict[str, str]:
+    return valid_variable_values(
+        settings.variable_values(gameid, levelid, categoryid),
+        levelid, categoryid)
+
+
+def valid_variable_values(values: Dict[str, str],
+                          levelid: Optional[str],
+                          categoryid: Optional[str]) -> Dict[str, str]:
     variableValues: Dict[str, str] = {}
-    params: Tuple[Any, ...]
-    params = chat.channel, gameid, levelid or '', categoryid or ''
     variableId: str
     value: str
-    async for variableId, value in await cursor.execute(query, params):
-        variable: speedrundata.Variable = variables[variableId]
-        if variable.scope == 'full-game':
-            if levelid is not None:
-                continue
-        elif variable.scope == 'all-levels':
-            if levelid is None:
-                continue
-        elif variable.scope == 'single-level':
-            if levelid != variable.levelId:
-                continue
-        elif variable.scope != 'global':
+    for variableId, value in values.items():
+        if variableId not in variables:
             continue
-        if (variable.categoryId is not None
-                and variable.categoryId != categoryid):
+        if not variables[variableId].applies(levelid, categoryid):
             continue
         variableValues[variableId] = value
     return variableValues
@@ -135,23 +235,120 @@ SELECT variable, value FROM speedruncom_variable
 async def channel_region(cursor: aioodbc.cursor.Cursor,
                          chat: 'data.Channel',
                          gameid: str) -> Optional[str]:
-    query: str = '''
-SELECT region FROM speedruncom_game_options WHERE broadcaster=? AND game=?
-'''
-    await cursor.execute(query, (chat.channel, gameid))
-    row: Optional[Tuple[Optional[str]]] = await cursor.fetchone()
-    return row[0] if row is not None else None
+    return (await channel_settings(cursor, chat)).regionid(gameid)
 
 
 async def channel_platform(cursor: aioodbc.cursor.Cursor,
                            chat: 'data.Channel',
                            gameid: str) -> Optional[str]:
-    query: str = '''
-SELECT platform FROM speedruncom_game_options WHERE broadcaster=? AND game=?
+    return (await channel_settings(cursor, chat)).platformid(gameid)
+
+
+async def channels_settings(cursor: aioodbc.cursor.Cursor,
+                            channels: List[str]
+                            ) -> Dict[str, speedrunsettings.ChannelSettings]:
+    settings: Dict[str, speedrunsettings.ChannelSettings] = {}
+    missing: List[str] = []
+    channel: str
+    for channel in channels:
+        cached: Optional[speedrunsettings.ChannelSettings]
+        cached = settingsCache.get(channel)
+        if cached is not None:
+            settings[channel] = cached
+        else:
+            missing.append(channel)
+    if missing:
+        generation: int = settingsCache.generation
+        loaded: Dict[str, speedrunsettings.ChannelSettings]
+        loaded = await query_channels_settings(cursor, missing)
+        for channel in missing:
+            settingsCache.store(loaded[channel], generation)
+        settings.update(loaded)
+    return settings
+
+
+async def query_channels_settings(
+        cursor: aioodbc.cursor.Cursor,
+        channels: List[str]) -> Dict[str, speedrunsettings.ChannelSettings]:
+    settings: Dict[str, speedrunsettings.ChannelSettings]
+    settings = {c: speedrunsettings.ChannelSettings(c) for c in channels}
+    i: int
+    for i in range(0, len(channels), queryBatchSize):
+        batch: Tuple[str, ...] = tuple(channels[i:i + queryBatchSize])
+        markers: str = ', '.join('?' * len(batch))
+        query: str
+        row: Tuple[Any, ...]
+        query = f'''
+SELECT broadcaster, userid FROM speedruncom_user
+    WHERE broadcaster IN ({markers})
+'''
+        async for row in await cursor.execute(query, batch):
+            settings[row[0]].user = row[1]
+        query = f'''
+SELECT broadcaster, game FROM speedruncom_game
+    WHERE broadcaster IN ({markers})
+'''
+        async for row in await cursor.execute(query, batch):
+            settings[row[0]].game = row[1]
+        query = f'''
+SELECT broadcaster, game, level FROM speedruncom_level
+    WHERE broadcaster IN ({markers})
+'''
+        async for row in await cursor.execute(query, batch):
+            settings[row[0]].levels[row[1]] = row[2]
+        query = f'''
+SELECT broadcaster, game, level, category FROM speedruncom_category
+    WHERE broadcaster IN ({markers})
+'''
+        async for row in await cursor.execute(query, batch):
+            settings[row[0]].categories[row[1], row[2]] = row[3]
+        query = f'''
+SELECT broadcaster, game, level, category, variable, value
+    FROM speedruncom_variable WHERE broadcaster IN ({markers})
 '''
-    await cursor.execute(query, (chat.channel, gameid))
-    row: Optional[Tuple[Optional[str]]] = await cursor.fetchone()
-    return row[0] if row is not None else None
+        async for row in await cursor.execute(query, batch):
+            variableValues: Dict[str, str]
+            variableValues = settings[row[0]].variables.setdefault(
+                (row[1], row[2], row[3]), {})
+            variableValues[row[4]] = row[5]
+        query = f'''
+SELECT broadcaster, game, region, platform FROM speedruncom_game_options
+    WHERE broadcaster IN ({markers})
+'''
+        async for row in await cursor.execute(query, batch):
+            settings[row[0]].regions[row[1]] = row[2]
+            settings[row[0]].platforms[row[1]] = row[3]
+    return settings
+
+
+async def twitch_gameids(cursor: aioodbc.cursor.Cursor,
+                         twitchGames: List[str]
+                         ) -> Dict[str, Optional[str]]:
+    gameIds: Dict[str, Optional[str]] = {}
+    games: List[str] = []
+    game: str
+    for game in set(g.lower() for g in twitchGames):
+        cached: bool
+        gameId: Optional[str]
+        cached, gameId = twitchGameCache.get(game)
+        if cached:
+            gameIds[game] = gameId
+        else:
+            games.append(game)
+    i: int
+    for i in range(0, len(games), queryBatchSize):
+        batch: Tuple[str, ...] = tuple(games[i:i + queryBatchSize])
+        markers: str = ', '.join('?' * len(batch))
+        query: str = f'''
+SELECT LOWER(twitchGame), game FROM speedruncom_twitch_game
+    WHERE LOWER(twitchGame) IN ({markers})
+'''
+        twitchGame: str
+        async for twitchGame, gameId in await cursor.execute(query, batch):
+            gameIds[twitchGame] = gameId if gameId is not None else ''
+    for game in games:
+        twitchGameCache.store(game, gameIds.get(game))
+    return gameIds
 
 
 async def clear_user(database: DatabaseMain,
@@ -161,6 +358,10 @@ async def clear_user(database: DatabaseMain,
         query: str = 'DELETE FROM speedruncom_user WHERE broadcaster=?'
         await cursor.execute(query, (channel,))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.user = None
         return cursor.rowcount != 0
 
 
@@ -185,6 +386,10 @@ INSERT INTO speedruncom_user (broadcaster, userid) VALUES (?, ?)
             params = channel, identifier, identifier,
         await cursor.execute(query, params)
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.user = identifier
         return cursor.rowcount != 0
 
 
@@ -195,6 +400,10 @@ async def clear_game(database: DatabaseMain,
         query: str = 'DELETE FROM speedruncom_game WHERE broadcaster=?'
         await cursor.execute(query, (channel,))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.game = None
         return cursor.rowcount != 0
 
 
@@ -219,6 +428,10 @@ INSERT INTO speedruncom_game (broadcaster, game) VALUES (?, ?)
             params = channel, gameId, gameId,
         await cursor.execute(query, params)
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.game = gameId
         return cursor.rowcount != 0
 
 
@@ -232,6 +445,10 @@ DELETE FROM speedruncom_level WHERE broadcaster=? AND game=?
 '''
         await cursor.execute(query, (channel, gameId))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.levels.pop(gameId, None)
         return cursor.rowcount != 0
 
 
@@ -257,6 +474,10 @@ INSERT INTO speedruncom_level (broadcaster, game, level) VALUES (?, ?, ?)
             params = channel, gameId, levelId, levelId,
         await cursor.execute(query, params)
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.levels[gameId] = levelId
         return cursor.rowcount != 0
 
 
@@ -272,6 +493,10 @@ DELETE FROM speedruncom_category
 '''
         await cursor.execute(query, (channel, gameId, levelId or ''))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.categories.pop((gameId, levelId or ''), None)
         return cursor.rowcount != 0
 
 
@@ -300,6 +525,10 @@ INSERT INTO speedruncom_category (broadcaster, game, level, category)
             params = channel, gameId, levelId or '', categoryId, categoryId
         await cursor.execute(query, params)
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.categories[gameId, levelId or ''] = categoryId
         return cursor.rowcount != 0
 
 
@@ -319,6 +548,11 @@ DELETE FROM speedruncom_variable
         await cursor.execute(query, (channel, gameId, levelId or '',
                                      categoryId or '', variableId))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.variable_values(gameId, levelId, categoryId).pop(
+                variableId, None)
         return cursor.rowcount != 0
 
 
@@ -353,6 +587,12 @@ INSERT INTO speedruncom_variable
                       variableId, value, value)
         await cursor.execute(query, params)
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.variables.setdefault(
+                (gameId, levelId or '', categoryId or ''), {})[
+                    variableId] = value
         return cursor.rowcount != 0
 
 
@@ -379,6 +619,10 @@ UPDATE speedruncom_game_options SET region=NULL
 '''
         await cursor.execute(query, (channel, gameId))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.regions[gameId] = None
         return cursor.rowcount != 0
 
 
@@ -405,6 +649,10 @@ UPDATE speedruncom_game_options SET region=? WHERE broadcaster=? AND game=?
 '''
         await cursor.execute(query, (regionId, channel, gameId))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.regions[gameId] = regionId
         return cursor.rowcount != 0
 
 
@@ -423,9 +671,18 @@ INSERT OR IGNORE INTO speedruncom_game_options (broadcaster, game)
             query = '''
 INSERT INTO speedruncom_game_options (broadcaster, game) VALUES (?, ?)
     ON CONFLICT DO NOTHING
+'''
+        await cursor.execute(query, (channel, gameId))
+        query = '''
+UPDATE speedruncom_game_options SET platform=NULL
+    WHERE broadcaster=? AND game=?
 '''
         await cursor.execute(query, (channel, gameId))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.platforms[gameId] = None
         return cursor.rowcount != 0
 
 
@@ -453,6 +710,10 @@ UPDATE speedruncom_game_options SET platform=?
 '''
         await cursor.execute(query, (platformId, channel, gameId))
         await database.commit()
+        settings: Optional[speedrunsettings.ChannelSettings]
+        settings = settingsCache.written(channel)
+        if settings is not None:
+            settings.platforms[gameId] = platformId
         return cursor.rowcount != 0
 
 
@@ -476,87 +737,350 @@ async def load_speedruncom_data(timestamp: Optional[datetime]=None) -> None:
 
 
 async def load_game(chat: 'data.Channel',
-                    cursor: aioodbc.cursor.Cursor,
                     gameId: Optional[str]=None,
                     search: Optional[str]=None,
                     timestamp: Optional[datetime]=None) -> str:
+    now: datetime = utils.now() if timestamp is None else timestamp
     await load_speedruncom_data(timestamp)
     if search:
         search = search.lower()
-        if search not in gameSearch:
-            await read_speedrun_search_game(search, timestamp)
-            if search in gameSearch and gameSearch[search] is not None:
-                await read_speedrun_game_by_id(gameSearch[search], timestamp)
-            elif search in bestSearch and bestSearch[search] is not None:
-                await read_speedrun_game_by_id(bestSearch[search], timestamp)
+        await load_game_search(search, now, chat.channel)
         return search
     else:
         if chat.twitchGame is None:
             return ''
         game: str = chat.twitchGame.lower()
-        if gameId is None:
-            gameId = await twitch_gameid(cursor, game)
         if gameId:
-            if gameId not in gameSearch:
-                await read_speedrun_game_by_id(gameId, timestamp)
+            await load_game_by_id(gameId, now, chat.channel)
             return gameId
         else:
-            if game and game not in gameSearch:
-                await read_speedrun_search_game(game, timestamp)
-                if game in gameSearch and gameSearch[game] is not None:
-                    await read_speedrun_game_by_id(gameSearch[game], timestamp)
-                elif game in bestSearch and bestSearch[game] is not None:
-                    await read_speedrun_game_by_id(bestSearch[game], timestamp)
+            if game:
+                await load_game_search(game, now, chat.channel)
             return game
 
 
+async def load_game_search(search: str,
+                           timestamp: datetime,
+                           channel: Optional[str]=None) -> None:
+    refreshDemand.hit(('gameSearch', search), timestamp, channel)
+    state: str = cache_state('gameSearch', search, timestamp, cacheDuration,
+                             maxStaleness)
+    if search not in gameSearch or state == 'expired':
+        await read_speedrun_search_game(search, timestamp)
+    elif state == 'stale':
+        revalidate(read_speedrun_search_game(search, timestamp, 'background'))
+    gameId: Optional[str] = gameSearch.get(search) or bestSearch.get(search)
+    if gameId is not None:
+        await load_game_by_id(gameId, timestamp, channel)
+
+
+async def load_game_by_id(gameId: str,
+                          timestamp: datetime,
+                          channel: Optional[str]=None) -> None:
+    refreshDemand.hit(('games', gameId), timestamp, channel)
+    state: str = cache_state('games', gameId, timestamp, cacheDuration,
+                             maxStaleness)
+    if gameId not in gameSearch or state == 'expired':
+        await read_speedrun_game_by_id(gameId, timestamp)
+    elif state == 'stale':
+        revalidate(read_speedrun_game_by_id(gameId, timestamp, 'background'))
+
+
 async def load_leaderboard(id: speedrundata.LeaderboardId,
-                           timestamp: datetime) -> None:
-    active_leaderboard(id, timestamp)
-    if id in leaderboards:
+                           timestamp: datetime,
+                           lane: str='interactive',
+                           channel: Optional[str]=None) -> None:
+    active_leaderboard(id, timestamp, channel)
+    if lane == 'interactive':
+        refreshDemand.hit(('leaderboards', id), timestamp)
+    state: str = cache_state('leaderboards', id, timestamp,
+                             leaderboardCacheDuration, leaderboardMaxStaleness)
+    if id in leaderboards and state != 'expired':
+        if state == 'stale':
+            revalidate(read_leaderboard(id, timestamp, 'background'))
         return
-    await read_leaderboard(id, timestamp)
+    await read_leaderboard(id, timestamp, lane)
 
 
 async def load_user(identifier: str,
-                    timestamp: datetime) -> None:
+                    timestamp: datetime,
+                    channel: Optional[str]=None) -> None:
     identifier = identifier.lower()
-    if identifier in playerLookup:
+    refreshDemand.hit(('playerLookup', identifier), timestamp, channel)
+    state: str = cache_state('playerLookup', identifier, timestamp,
+                             cacheDuration, maxStaleness)
+    if identifier in playerLookup and state != 'expired':
+        playerLookup.touch(identifier)
+        if state == 'stale':
+            revalidate(read_user(identifier, timestamp, 'background'))
         return
     await read_user(identifier, timestamp)
 
 
+def cache_state(kind: str,
+                key: Hashable,
+                timestamp: datetime,
+                duration: timedelta,
+                maximum: timedelta) -> str:
+    if (kind, key) not in cache:
+        return 'fresh'
+    age: timedelta = timestamp - cache[kind, key]
+    if age < duration:
+        return 'fresh'
+    if age <= maximum:
+        return 'stale'
+    return 'expired'
+
+
+def revalidate(refresh: Awaitable[None]) -> None:
+    asyncio.ensure_future(run_revalidation(refresh))
+
+
+async def run_revalidation(refresh: Awaitable[None]) -> None:
+    try:
+        await refresh
+    except Exception:
+        logging.log('speedruncom#error.log',
+                    f'{utils.now()} {traceback.format_exc()}\n')
+
+
 def active_leaderboard(id: speedrundata.LeaderboardId,
-                       timestamp: datetime) -> None:
+                       timestamp: datetime,
+                       channel: Optional[str]=None) -> None:
     leaderboardRequest[id] = timestamp
+    leaderboards.touch(id)
+    cache.reschedule('leaderboards', id)
+    if channel is not None:
+        refreshDemand.own(('leaderboards', id), channel)
+
+
+def get_session() -> aiohttp.ClientSession:
+    global session
+    if session is None or session.closed:
+        connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+            limit=connectionLimit,
+            limit_per_host=connectionLimitPerHost,
+            keepalive_timeout=keepAliveTimeout,
+            ttl_dns_cache=dnsCacheTimeout)
+        headers: Dict[str, str] = {
+            'User-Agent': 'MeGotsThis/BotGotsThis',
+            }
+        session = aiohttp.ClientSession(connector=connector,
+                                        headers=headers,
+                                        raise_for_status=True)
+    return session
+
 
+async def close_session() -> None:
+    global session
+    if session is not None and not session.closed:
+        await session.close()
+    session = None
+
+
+def shutdown_session() -> None:
+    global session
+    if session is not None and not session.closed:
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        if loop.is_closed() or loop.is_running():
+            session.connector.close()
+        else:
+            loop.run_until_complete(session.close())
+    session = None
 
-async def read_speedruncom_api(url: str) -> Dict[str, Any]:
+
+async def read_speedruncom_api(url: str,
+                               lane: speedrunrequest.Lane,
+                               fingerprint: Optional[Tuple[str, Hashable]]=None
+                               ) -> Dict[str, Any]:
+    try:
+        return await requestFlights.run(
+            url, lambda: fetch_speedruncom_api(url, lane, fingerprint), lane,
+            join_timeout(lane))
+    except asyncio.TimeoutError:
+        return apiUnavailable
+
+
+def join_timeout(lane: speedrunrequest.Lane) -> Optional[float]:
+    # Joining a slower flight must not make a command wait any longer
+    if lane.name == 'interactive':
+        return interactiveDeadline
+    return None
+
+
+def api_endpoint(url: str) -> str:
+    path: str = urllib.parse.urlsplit(url).path
+    return path[len('/api/v1/'):].split('/', 1)[0]
+
+
+async def fetch_speedruncom_api(url: str,
+                                lane: speedrunrequest.Lane,
+                                fingerprint: Optional[Tuple[str, Hashable]]
+                                ) -> Dict[str, Any]:
+    endpoint: str = api_endpoint(url)
+    deadline: float = (interactiveDeadline if lane.name == 'interactive'
+                       else backgroundDeadline)
+    retries: int = (interactiveRetries if lane.name == 'interactive'
+                    else backgroundRetries)
+    attempt: int
+    for attempt in range(retries + 1):
+        if not circuitBreaker.allow():
+            return apiUnavailable
+        wait: float = apiBackoff.wait_time(endpoint)
+        if wait > deadline:
+            return apiUnavailable
+        if wait:
+            await asyncio.sleep(wait)
+        try:
+            data_: Dict[str, Any] = await request_speedruncom_api(
+                url, lane, deadline, fingerprint)
+        except speedrunrequest.RateLimitExceeded:
+            circuitBreaker.cancel()
+            return apiUnavailable
+        except (ValueError, asyncio.CancelledError):
+            circuitBreaker.cancel()
+            raise
+        except aiohttp.ClientResponseError as e:
+            if e.code < 500 and e.code != 429:
+                record_api_success(endpoint)
+                return {}
+            record_api_failure(endpoint, url, e)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            record_api_failure(endpoint, url, e)
+        else:
+            record_api_success(endpoint)
+            return data_
+    return apiUnavailable
+
+
+def responded(data_: Dict[str, Any]) -> bool:
+    return data_ is not apiUnavailable
+
+
+async def refreshing(keys: List[Tuple[str, Hashable]],
+                     refresh: Awaitable[None]) -> None:
+    # Timestamps only move on a response, so a failure keeps the old age
+    kind: str
+    key: Hashable
+    for kind, key in keys:
+        cache.park(kind, key)
+    try:
+        await refresh
+    finally:
+        for kind, key in keys:
+            cache.reschedule(kind, key)
+
+
+def record_api_success(endpoint: str) -> None:
+    if circuitBreaker.state != 'closed':
+        logging.log('speedruncom.log',
+                    f'{utils.now()} Circuit breaker closed\n')
+    circuitBreaker.success()
+    apiBackoff.success(endpoint)
+
+
+def record_api_failure(endpoint: str,
+                       url: str,
+                       error: Exception) -> None:
+    delay: float = apiBackoff.failure(endpoint)
+    logging.log('speedruncom#error.log',
+                f'{utils.now()} {url} {error!r} retry in {delay:.1f}s\n')
+    wasOpen: bool = circuitBreaker.state == 'open'
+    circuitBreaker.failure()
+    if not wasOpen and circuitBreaker.state == 'open':
+        logging.log('speedruncom.log',
+                    f'{utils.now()} Circuit breaker opened\n')
+
+
+async def request_speedruncom_api(url: str,
+                                  lane: speedrunrequest.Lane,
+                                  deadline: float,
+                                  fingerprint: Optional[Tuple[str, Hashable]]
+                                  ) -> Dict[str, Any]:
     try:
         utils.print(url)
         logging.log('speedruncom.log', f'{utils.now()} {url}\n')
-        headers: Dict[str, str] = {
-            'User-Agent': 'MeGotsThis/BotGotsThis',
-            }
-        session: aiohttp.ClientSession
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        cached: Optional[speedruncache.CachedResponse] = responseCache.get(url)
+        if cached is None:
+            cached = await loop.run_in_executor(None, responseCache.load, url)
+            if cached is not None:
+                responseCache.add(cached)
+        headers: Dict[str, str] = {}
+        if cached is not None:
+            headers = responseCache.validators(cached)
+        await requestScheduler.acquire(lane, deadline)
         response: aiohttp.ClientResponse
-        async with aiohttp.ClientSession(raise_for_status=True) as session, \
-                session.get(url,
-                            timeout=bot.config.httpTimeout,
-                            headers=headers) as response:
-            return await response.json()
+        async with get_session().get(url,
+                                     timeout=bot.config.httpTimeout,
+                                     headers=headers) as response:
+            body: Optional[bytes]
+            if response.status == 304 and cached is not None:
+                if (fingerprint is not None
+                        and payloadFingerprints.matches(
+                            fingerprint[0], fingerprint[1],
+                            responseCache.digest(url))):
+                    responseCache.not_modified(cached, False)
+                    return apiUnchanged
+                body = await loop.run_in_executor(None, responseCache.read,
+                                                  cached)
+                if body is not None:
+                    try:
+                        reloaded: Dict[str, Any]
+                        reloaded = json.loads(body.decode('utf-8'))
+                    except ValueError:
+                        pass
+                    else:
+                        responseCache.not_modified(cached, True)
+                        responseCache.fingerprint(url, body)
+                        return reloaded
+                responseCache.discard(url)
+            else:
+                body = await response.read()
+                data_: Dict[str, Any] = json.loads(body.decode('utf-8'))
+                responseCache.fingerprint(url, body)
+                entry: Optional[speedruncache.CachedResponse]
+                entry = responseCache.store(
+                    url, response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'), body)
+                if entry is not None:
+                    await loop.run_in_executor(None, responseCache.write,
+                                               entry, body)
+                await remove_responses()
+                return data_
+        return await request_speedruncom_api(url, lane, deadline, None)
     except ValueError:
         logging.log('speedruncom#error.log', f'{url}\n')
         raise
-    except aiohttp.ClientError:
-        return {}
 
 
-async def read_platforms(timestamp: Optional[datetime]=None) -> None:
+async def remove_responses() -> None:
+    urls: List[str] = responseCache.removals()
+    if urls:
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, responseCache.remove, urls)
+
+
+async def prune_responses() -> None:
+    await remove_responses()
+    loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, responseCache.prune,
+                               responseCache.paths())
+
+
+async def read_platforms(timestamp: Optional[datetime]=None,
+                         lane: str='interactive') -> None:
+    await refreshing([('platforms', '')],
+                     fetch_platforms(timestamp, speedrunrequest.Lane(lane)))
+
+
+async def fetch_platforms(timestamp: Optional[datetime],
+                          lane: speedrunrequest.Lane) -> None:
     now: datetime = utils.now() if timestamp is None else timestamp
-    cache['platforms', ''] = now
     url: str = 'http://www.speedrun.com/api/v1/platforms?max=200'
-    data_: Dict[str, Any] = await read_speedruncom_api(url)
+    data_: Dict[str, Any] = await read_speedruncom_api(url, lane)
+    if responded(data_):
+        cache['platforms', ''] = now
     if data_ and 'data' in data_ and data_['data']:
         platformData: Dict[Any, Any]
         for platformData in data_['data']:
@@ -567,14 +1091,21 @@ async def read_platforms(timestamp: Optional[datetime]=None) -> None:
                 platform = speedrundata.Platform(platformData)
                 platforms[platform.id] = platform
             platform.update(platformData)
-        cache['platforms', ''] = now
 
 
-async def read_regions(timestamp: Optional[datetime]=None) -> None:
+async def read_regions(timestamp: Optional[datetime]=None,
+                       lane: str='interactive') -> None:
+    await refreshing([('regions', '')],
+                     fetch_regions(timestamp, speedrunrequest.Lane(lane)))
+
+
+async def fetch_regions(timestamp: Optional[datetime],
+                        lane: speedrunrequest.Lane) -> None:
     now: datetime = utils.now() if timestamp is None else timestamp
-    cache['regions', ''] = now
     url: str = 'http://www.speedrun.com/api/v1/regions'
-    data_: Dict[str, Any] = await read_speedruncom_api(url)
+    data_: Dict[str, Any] = await read_speedruncom_api(url, lane)
+    if responded(data_):
+        cache['regions', ''] = now
     if data_ and 'data' in data_ and data_['data']:
         regionData: Dict[Any, Any]
         for regionData in data_['data']:
@@ -585,21 +1116,27 @@ async def read_regions(timestamp: Optional[datetime]=None) -> None:
                 region = speedrundata.Region(regionData)
                 regions[region.id] = region
             region.update(regionData)
-        cache['regions', ''] = now
 
 
 async def read_speedrun_search_game(
         search: str,
-        timestamp: Optional[datetime]=None) -> None:
+        timestamp: Optional[datetime]=None,
+        lane: str='interactive') -> None:
+    await refreshing([('gameSearch', search)],
+                     fetch_speedrun_search_game(search, timestamp,
+                                                speedrunrequest.Lane(lane)))
+
+
+async def fetch_speedrun_search_game(search: str,
+                                     timestamp: Optional[datetime],
+                                     lane: speedrunrequest.Lane) -> None:
     now: datetime = utils.now() if timestamp is None else timestamp
-    cache['gameSearch', search] = now
-    cache['bestSearch', search] = now
     url: str
     data_: Dict[str, Any]
     game: Dict[Any, Any]
     correct: List[str]
     url = 'http://www.speedrun.com/api/v1/games/' + urllib.parse.quote(search)
-    data_ = await read_speedruncom_api(url)
+    data_ = await read_speedruncom_api(url, lane)
     if data_ and 'data' in data_ and data_['data']:
         game = data_['data']
         correct = [game['names']['international'].lower(),
@@ -612,7 +1149,7 @@ async def read_speedrun_search_game(
             return
     url = ('http://www.speedrun.com/api/v1/games?name='
            + urllib.parse.quote(search) + '&max=1')
-    data_ = await read_speedruncom_api(url)
+    data_ = await read_speedruncom_api(url, lane)
     if data_ and 'data' in data_ and data_['data']:
         game = data_['data'][0]
         correct = [game['names']['international'].lower(),
@@ -623,6 +1160,11 @@ async def read_speedrun_search_game(
             cache['gameSearch', search] = now
             cache['bestSearch', search] = now
             return
+    if not data_ or 'data' not in data_:
+        if responded(data_):
+            cache['gameSearch', search] = now
+            cache['bestSearch', search] = now
+        return
     gameSearch[search] = None
     if len(data_['data']):
         game = data_['data'][0]
@@ -634,33 +1176,79 @@ async def read_speedrun_search_game(
 
 
 async def read_speedrun_game_by_id(gameId: str,
-                                   timestamp: Optional[datetime]=None) -> None:
+                                   timestamp: Optional[datetime]=None,
+                                   lane: str='interactive') -> None:
+    flightLane: speedrunrequest.Lane = speedrunrequest.Lane(lane)
+    try:
+        await refreshFlights.run(
+            ('games', gameId),
+            lambda: refreshing(
+                [('games', gameId), ('gameSearch', gameId)],
+                fetch_speedrun_game_by_id(gameId, timestamp, flightLane)),
+            flightLane, join_timeout(flightLane))
+    except asyncio.TimeoutError:
+        pass
+
+
+async def fetch_speedrun_game_by_id(gameId: str,
+                                    timestamp: Optional[datetime],
+                                    lane: speedrunrequest.Lane) -> None:
     now: datetime = utils.now() if timestamp is None else timestamp
-    cache['gameSearch', gameId] = now
-    cache['games', gameId] = now
     url: str = ('http://www.speedrun.com/api/v1/games/' + gameId
                 + '?embed=categories,levels.categories,variables')
-    data_: Dict[str, Any] = await read_speedruncom_api(url)
-    if not data_ or not data_['data']:
+    fingerprint: Optional[Tuple[str, Hashable]] = None
+    if gameId in games:
+        fingerprint = 'games', gameId
+    data_: Dict[str, Any] = await read_speedruncom_api(url, lane, fingerprint)
+    if data_ is apiUnchanged:
+        if gameId in games:
+            gameSearch[gameId] = gameId
+            cache['gameSearch', gameId] = now
+            cache['games', gameId] = now
+        return None
+    if not data_:
+        if responded(data_):
+            cache['gameSearch', gameId] = now
+            cache['games', gameId] = now
+        return None
+    if not data_['data']:
         gameSearch[gameId] = None
         cache['gameSearch', gameId] = now
         return None
+    digest: Optional[bytes] = responseCache.digest(url)
     game: speedrundata.Game
     if gameId in games:
         game = games[gameId]
+        if not payloadFingerprints.unchanged('games', gameId, digest):
+            parse_speedruncom_game_category_level(game, data_['data'])
     else:
         game = speedrundata.Game(data_['data'])
         games[game.id] = game
-    parse_speedruncom_game_category_level(game, data_['data'])
+        parse_speedruncom_game_category_level(game, data_['data'])
+    payloadFingerprints.record('games', gameId, digest)
     gameSearch[gameId] = gameId
     cache['gameSearch', gameId] = now
     cache['games', gameId] = now
 
 
 async def read_leaderboard(id: speedrundata.LeaderboardId,
-                           timestamp: Optional[datetime]=None) -> None:
+                           timestamp: Optional[datetime]=None,
+                           lane: str='interactive') -> None:
+    flightLane: speedrunrequest.Lane = speedrunrequest.Lane(lane)
+    try:
+        await refreshFlights.run(
+            ('leaderboards', id),
+            lambda: refreshing([('leaderboards', id)],
+                               fetch_leaderboard(id, timestamp, flightLane)),
+            flightLane, join_timeout(flightLane))
+    except asyncio.TimeoutError:
+        pass
+
+
+async def fetch_leaderboard(id: speedrundata.LeaderboardId,
+                            timestamp: Optional[datetime],
+                            lane: speedrunrequest.Lane) -> None:
     now: datetime = utils.now() if timestamp is None else timestamp
-    cache['leaderboards', id] = now
     url: str
     if id.levelid is None:
         url = ('http://www.speedrun.com/api/v1/leaderboards/' + id.gameid
@@ -674,27 +1262,55 @@ async def read_leaderboard(id: speedrundata.LeaderboardId,
     if id.platformid is not None:
         url += '&platform=' + id.platformid
     variableId: str
-    value: str
-    for variableId, value in id.variables.items():
-        url += '&var-' + variableId + '=' + urllib.parse.quote(value)
-    data_: Dict[str, Any] = await read_speedruncom_api(url)
-    leaderboard: speedrundata.Leaderboard
-    if id in leaderboards:
-        leaderboard = leaderboards[id]
-        leaderboard.reset()
-    else:
-        leaderboard = speedrundata.Leaderboard(url, data_['data'])
-        leaderboards[id] = leaderboard
+    value: Optional[str]
+    for variableId, value in id.variables:
+        if value is not None:
+            url += '&var-' + variableId + '=' + urllib.parse.quote(value)
+    fingerprint: Optional[Tuple[str, Hashable]] = None
+    if reusable_leaderboard(id):
+        fingerprint = 'leaderboards', id
+    data_: Dict[str, Any] = await read_speedruncom_api(url, lane, fingerprint)
+    if data_ is apiUnchanged:
+        if reusable_leaderboard(id):
+            reuse_leaderboard(id, now)
+        return
+    if not data_ or 'data' not in data_:
+        if responded(data_):
+            cache['leaderboards', id] = now
+        return
+    digest: Optional[bytes] = responseCache.digest(url)
+    if (reusable_leaderboard(id)
+            and payloadFingerprints.unchanged('leaderboards', id, digest)):
+        reuse_leaderboard(id, now)
+        return
+    rows: List[Tuple[int, speedrundata.Run]] = []
+    updatedRuns: List[str] = []
     runData: Dict[Any, Any]
     for runData in data_['data']['runs']:
         run: speedrundata.Run
         if runData['run']['id'] in runs:
             run = runs[runData['run']['id']]
+            details: Tuple[Any, ...] = run_details(run)
             run.update(runData['run'])
+            if details != run_details(run):
+                updatedRuns.append(run.id)
         else:
             run = speedrundata.Run(runData['run'])
             runs[run.id] = run
-        leaderboard.add_run(runData['place'], run)
+        rows.append((runData['place'], run))
+    leaderboard: speedrundata.Leaderboard
+    changes: List[speedrundata.LeaderboardChange]
+    if id in leaderboards:
+        leaderboard = leaderboards[id]
+        changes = leaderboard.update(rows)
+        changes.extend(speedrundata.LeaderboardChange('run-updated', runId)
+                       for runId in updatedRuns)
+        if changes:
+            notify_leaderboard(id, changes)
+    else:
+        leaderboard = speedrundata.Leaderboard(url, data_['data'])
+        leaderboard.update(rows)
+        leaderboards[id] = leaderboard
     for playerData in data_['data']['players']['data']:
         if playerData['rel'] == 'guest':
             continue
@@ -702,62 +1318,143 @@ async def read_leaderboard(id: speedrundata.LeaderboardId,
             player: speedrundata.Player = players[playerData['id']]
             oldTwitch: Optional[str]
             oldTwitch = player.twitch.lower() if player.twitch else None
+            oldName: Tuple[str, Optional[str]]
+            oldName = player.name, player.twitchUrl
             player.update(playerData)
+            if oldName != (player.name, player.twitchUrl):
+                messageCache.clear()
             currentTwitch: Optional[str] = None
             if player.twitch is not None:
                 currentTwitch = player.twitch.lower()
             if oldTwitch is not None and oldTwitch != currentTwitch:
-                del twitchPlayer[oldTwitch]
-                del cache['twitchPlayer', oldTwitch]
+                twitchPlayer.pop(oldTwitch, None)
+                cache.pop(('twitchPlayer', oldTwitch), None)
         else:
             player = speedrundata.Player(playerData)
             players[player.id] = player
-        if player.twitch is not None:
-            twitch: str = player.twitch.lower()
-            playerLookup[twitch] = player.id
-            twitchPlayer[twitch] = player.id
-            if ('playerLookup', twitch) in cache:
-                cache['playerLookup', twitch] = now
-        playerLookup[player.name] = player.id
-        playerLookup[player.id] = player.id
-        cache['players', player.id] = now
-        if ('playerLookup', player.name) in cache:
-            cache['playerLookup', player.name] = now
-        if ('playerLookup', player.id) in cache:
-            cache['playerLookup', player.id] = now
+        touch_player(player, now)
+    payloadFingerprints.record('leaderboards', id, digest)
     cache['leaderboards', id] = now
+    trim_cache()
+
+
+def reusable_leaderboard(id: speedrundata.LeaderboardId) -> bool:
+    return (id in leaderboards
+            and all(p in players for p in leaderboards[id].rowByPlayer))
+
+
+def reuse_leaderboard(id: speedrundata.LeaderboardId,
+                      timestamp: datetime) -> None:
+    playerId: str
+    for playerId in leaderboards[id].rowByPlayer:
+        touch_player(players[playerId], timestamp)
+    cache['leaderboards', id] = timestamp
+
+
+def touch_player(player: speedrundata.Player,
+                 timestamp: datetime) -> None:
+    if player.twitch is not None:
+        twitch: str = player.twitch.lower()
+        playerLookup[twitch] = player.id
+        twitchPlayer[twitch] = player.id
+        if ('playerLookup', twitch) in cache:
+            cache['playerLookup', twitch] = timestamp
+    playerLookup[player.name] = player.id
+    playerLookup[player.id] = player.id
+    cache['players', player.id] = timestamp
+    if ('playerLookup', player.name) in cache:
+        cache['playerLookup', player.name] = timestamp
+    if ('playerLookup', player.id) in cache:
+        cache['playerLookup', player.id] = timestamp
+
+
+def run_details(run: speedrundata.Run) -> Tuple[Any, ...]:
+    return (run.weblink, run.dateText, run.submittedText,
+            tuple(p if isinstance(p, str) else p.name for p in run.playerids))
+
+
+def add_leaderboard_listener(listener: LeaderboardListener) -> None:
+    leaderboardListeners.append(listener)
+
+
+def remove_leaderboard_listener(listener: LeaderboardListener) -> None:
+    if listener in leaderboardListeners:
+        leaderboardListeners.remove(listener)
+
+
+def notify_leaderboard(id: speedrundata.LeaderboardId,
+                       changes: List[speedrundata.LeaderboardChange]) -> None:
+    change: speedrundata.LeaderboardChange
+    for change in changes:
+        leaderboardChanges[change.kind] = (
+            leaderboardChanges.get(change.kind, 0) + 1)
+    listener: LeaderboardListener
+    for listener in list(leaderboardListeners):
+        try:
+            listener(id, changes)
+        except Exception:
+            logging.log('speedruncom#error.log',
+                        f'{utils.now()} {traceback.format_exc()}\n')
+
+
+def invalidate_messages(id: speedrundata.LeaderboardId,
+                        changes: List[speedrundata.LeaderboardChange]
+                        ) -> None:
+    messageCache.invalidate(id)
+    # Runs are shared, so other boards listing an updated run are stale too
+    updated: Set[str] = set(c.runId for c in changes
+                            if c.kind == 'run-updated' and c.runId is not None)
+    if updated:
+        messageCache.invalidate_where(
+            lambda group: group in leaderboards
+            and not updated.isdisjoint(leaderboards[group].rowByRun))
 
 
 async def read_user(identifier: str,
-                    timestamp: Optional[datetime]=None) -> None:
+                    timestamp: Optional[datetime]=None,
+                    lane: str='interactive') -> None:
+    await refreshing([('playerLookup', identifier)],
+                     fetch_user(identifier, timestamp,
+                                speedrunrequest.Lane(lane)))
+
+
+async def fetch_user(identifier: str,
+                     timestamp: Optional[datetime],
+                     lane: speedrunrequest.Lane) -> None:
     now: datetime = utils.now() if timestamp is None else timestamp
-    cache['playerLookup', identifier] = now
     url: str
     data_: Dict[str, Any]
+    answered: bool = True
     url = ('http://www.speedrun.com/api/v1/users/'
            + urllib.parse.quote(identifier))
-    data_ = await read_speedruncom_api(url)
+    data_ = await read_speedruncom_api(url, lane)
+    answered = answered and responded(data_)
     if data_ and 'data' in data_ and data_['data']:
         parse_user(data_['data'], identifier, now)
         return
     url = ('http://www.speedrun.com/api/v1/users?twitch='
            + urllib.parse.quote(identifier))
-    data_ = await read_speedruncom_api(url)
+    data_ = await read_speedruncom_api(url, lane)
+    answered = answered and responded(data_)
     if data_ and 'data' in data_ and data_['data']:
         parse_user(data_['data'][0], identifier, now)
         return
     url = ('http://www.speedrun.com/api/v1/users?name='
            + urllib.parse.quote(identifier))
-    data_ = await read_speedruncom_api(url)
+    data_ = await read_speedruncom_api(url, lane)
+    answered = answered and responded(data_)
     if data_ and 'data' in data_ and data_['data']:
         parse_user(data_['data'][0], identifier, now)
         return
     url = ('http://www.speedrun.com/api/v1/users?lookup='
            + urllib.parse.quote(identifier))
-    data_ = await read_speedruncom_api(url)
+    data_ = await read_speedruncom_api(url, lane)
+    answered = answered and responded(data_)
     if data_ and 'data' in data_ and data_['data']:
         parse_user(data_['data'][0], identifier, now)
         return
+    if answered:
+        cache['playerLookup', identifier] = now
 
 
 def parse_speedruncom_game_category_level(game: speedrundata.Game,
@@ -766,8 +1463,12 @@ def parse_speedruncom_game_category_level(game: speedrundata.Game,
                                           ) -> None:
     now: datetime = utils.now() if timestamp is None else timestamp
     game.update(data_)
+    game.version += 1
+    messageCache.invalidate_where(lambda id: id.gameid == game.id)
     categoriesToClear: Set[str]
     categoriesToClear = set(game.game_categories) | set(game.level_categories)
+    categoriesParsed: Set[str] = set()
+    categoryId: str
     data_category: Dict[Any, Any]
     for data_category in data_['categories']['data']:
         category: speedrundata.Category
@@ -787,6 +1488,7 @@ def parse_speedruncom_game_category_level(game: speedrundata.Game,
                 del game.game_categories[category.id]
             game.level_categories[category.id] = category
         categoriesToClear.discard(category.id)
+        categoriesParsed.add(category.id)
     levelsToClear: Set[str]
     levelsToClear = set(k for k in game.levels.keys() if k is not None)
     data_level: Dict[Any, Any]
@@ -800,9 +1502,25 @@ def parse_speedruncom_game_category_level(game: speedrundata.Game,
         level.update(data_level)
         cache['levels', level.id] = now
         game.levels[level.id] = level
+        levelCategoriesToClear: Set[str] = set(level.categories)
         for data_category in data_level['categories']['data']:
-            category = speedrundata.Category(game, data_category)
+            if data_category['id'] in categoriesParsed:
+                category = categories[data_category['id']]
+            else:
+                if data_category['id'] in categories:
+                    category = categories[data_category['id']]
+                    category.update(data_category)
+                else:
+                    category = speedrundata.Category(game, data_category)
+                    categories[category.id] = category
+                cache['categories', category.id] = now
+                game.level_categories[category.id] = category
+                categoriesToClear.discard(category.id)
+                categoriesParsed.add(category.id)
             level.categories[category.id] = category
+            levelCategoriesToClear.discard(category.id)
+        for categoryId in levelCategoriesToClear:
+            del level.categories[categoryId]
         levelsToClear.discard(level.id)
     variablesToClear: Set[str]
     variablesToClear = set(v for v in game.variables.keys() if v is not None)
@@ -818,7 +1536,6 @@ def parse_speedruncom_game_category_level(game: speedrundata.Game,
         cache['variables', variable.id] = now
         game.variables[variable.id] = variable
         variablesToClear.discard(variable.id)
-    categoryId: str
     for categoryId in categoriesToClear:
         if categoryId in game.game_categories:
             del game.game_categories[categoryId]
@@ -838,6 +1555,7 @@ def parse_speedruncom_game_category_level(game: speedrundata.Game,
             del game.variables[variableId]
         if variableId in variables:
             del variables[variableId]
+    game.index_variables()
 
 
 def parse_user(data_: Dict[Any, Any],
@@ -849,10 +1567,13 @@ def parse_user(data_: Dict[Any, Any],
         player = players[data_['id']]
         oldTwitch: Optional[str]
         oldTwitch = player.twitch.lower() if player.twitch else None
+        oldName: Tuple[str, Optional[str]] = player.name, player.twitchUrl
         player.update(data_)
+        if oldName != (player.name, player.twitchUrl):
+            messageCache.clear()
         if oldTwitch is not None and oldTwitch != player.twitch.lower():
-            del twitchPlayer[oldTwitch]
-            del cache['twitchPlayer', oldTwitch]
+            twitchPlayer.pop(oldTwitch, None)
+            cache.pop(('twitchPlayer', oldTwitch), None)
     else:
         player = speedrundata.Player(data_)
         players[player.id] = player
@@ -869,11 +1590,143 @@ def parse_user(data_: Dict[Any, Any],
     cache['playerLookup', identifier] = now
     cache['playerLookup', player.name] = now
     cache['playerLookup', player.id] = now
+    trim_cache()
+
+
+def trim_cache() -> None:
+    evicted: bool = False
+    key: Hashable
+    leaderboard: speedrundata.Leaderboard
+    for key, leaderboard in leaderboards.evict():
+        id: speedrundata.LeaderboardId = cast(speedrundata.LeaderboardId, key)
+        responseCache.discard(leaderboard.api)
+        leaderboardRequest.pop(id, None)
+        payloadFingerprints.discard('leaderboards', id)
+        messageCache.invalidate(id)
+        cache.pop(('leaderboards', id), None)
+        evicted = True
+    identifier: Hashable
+    for identifier, _ in playerLookup.evict():
+        cache.pop(('playerLookup', identifier), None)
+    if evicted or len(runs) > max(runsAfterSweep * 2, minimumRunSweep):
+        collect_garbage()
+
+
+def collect_garbage() -> None:
+    global runsAfterSweep
+    liveRuns: Set[str] = set()
+    leaderboard: speedrundata.Leaderboard
+    for leaderboard in leaderboards.values():
+        liveRuns.update(leaderboard.runIds)
+    runId: str
+    for runId in [r for r in runs if r not in liveRuns]:
+        del runs[runId]
+    livePlayers: Set[str] = set(p for p in playerLookup.values()
+                                if p is not None)
+    run: speedrundata.Run
+    for run in runs.values():
+        livePlayers.update(p for p in run.playerids if isinstance(p, str))
+    twitch: str
+    for twitch in [t for t, p in twitchPlayer.items()
+                   if p not in livePlayers]:
+        del twitchPlayer[twitch]
+        cache.pop(('twitchPlayer', twitch), None)
+    playerId: str
+    for playerId in [p for p in players if p not in livePlayers]:
+        del players[playerId]
+        cache.pop(('players', playerId), None)
+    id: speedrundata.LeaderboardId
+    for id in [i for i in leaderboardRequest
+               if i not in leaderboards and ('leaderboards', i) not in cache]:
+        del leaderboardRequest[id]
+    refreshDemand.prune(lambda key: key in cache)
+    runsAfterSweep = len(runs)
+
+
+def dump_snapshot() -> bytes:
+    state: Dict[str, Any] = {
+        'version': snapshotVersion,
+        'cache': list(cache.items()),
+        'leaderboardRequest': leaderboardRequest,
+        'twitchPlayer': twitchPlayer,
+        'playerLookup': list(playerLookup.items()),
+        'gameSearch': gameSearch,
+        'bestSearch': bestSearch,
+        'platforms': platforms,
+        'regions': regions,
+        'games': games,
+        'levels': levels,
+        'categories': categories,
+        'variables': variables,
+        'players': players,
+        'runs': runs,
+        'leaderboards': list(leaderboards.items()),
+        }
+    return pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+
+
+def write_snapshot(snapshot: bytes) -> None:
+    compressed: bytes = zlib.compress(snapshot)
+    temporary: str = snapshotFile + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(snapshotFile), exist_ok=True)
+        with open(temporary, 'wb') as file:
+            file.write(compressed)
+        os.replace(temporary, snapshotFile)
+    except OSError:
+        logging.log('speedruncom#error.log',
+                    f'{utils.now()} Could not write {snapshotFile}\n')
+
+
+def save_snapshot() -> None:
+    write_snapshot(dump_snapshot())
+
+
+def load_snapshot() -> bool:
+    if games or leaderboards or players:
+        return False
+    try:
+        with open(snapshotFile, 'rb') as file:
+            state: Dict[str, Any] = pickle.loads(zlib.decompress(file.read()))
+    except FileNotFoundError:
+        return False
+    except (OSError, EOFError, AttributeError, ImportError, ValueError,
+            pickle.UnpicklingError, zlib.error):
+        logging.log('speedruncom#error.log',
+                    f'{utils.now()} Could not read {snapshotFile}\n')
+        return False
+    if state.get('version') != snapshotVersion:
+        return False
+    key: Tuple[str, Union[speedrundata.LeaderboardId, str]]
+    timestamp: datetime
+    for key, timestamp in state['cache']:
+        cache[key] = timestamp
+    leaderboardRequest.update(state['leaderboardRequest'])
+    twitchPlayer.update(state['twitchPlayer'])
+    playerLookup.update(state['playerLookup'])
+    gameSearch.update(state['gameSearch'])
+    bestSearch.update(state['bestSearch'])
+    platforms.update(state['platforms'])
+    regions.update(state['regions'])
+    games.update(state['games'])
+    levels.update(state['levels'])
+    categories.update(state['categories'])
+    variables.update(state['variables'])
+    players.update(state['players'])
+    runs.update(state['runs'])
+    leaderboards.update(state['leaderboards'])
+    trim_cache()
+    return True
 
 
 def botReloadSpeedrun(send: Send) -> None:
     send('Invalidating Speedrun.com cache')
 
+    responseCache.clear()
+    payloadFingerprints.clear()
+    settingsCache.invalidate()
+    twitchGameCache.invalidate()
+    resolvedLeaderboards.clear()
     twitchPlayer.clear()
     playerLookup.clear()
     gameSearch.clear()
@@ -885,11 +1738,93 @@ def botReloadSpeedrun(send: Send) -> None:
     runs.clear()
     leaderboards.clear()
     cache.clear()
+    messageCache.clear()
     levels[None] = None
 
     send('Done')
 
 
+def botSpeedrunStats(send: Send) -> None:
+    send(f'''\
+Response cache: {len(responseCache.entries)} entries, \
+{responseCache.notModified} not modified, \
+{responseCache.bytesSaved} bytes saved, \
+{responseCache.parsesSaved} parses saved''')
+    send(f'''\
+Rate limit: {rateLimiter.remaining()}/{rateLimiter.capacity} calls left, \
+full in {rateLimiter.reset_time():.1f}s, \
+{requestScheduler.waiting['interactive']} interactive and \
+{requestScheduler.waiting['background']} background queued''')
+    send(f'''\
+Circuit breaker: {circuitBreaker.state}, \
+{circuitBreaker.failures} failures, \
+retry in {circuitBreaker.retry_time():.1f}s''')
+    send(f'''\
+Objects: {len(leaderboards)}/{leaderboards.limit} leaderboards, \
+{len(runs)} runs, {len(players)} players, \
+{len(playerLookup)}/{playerLookup.limit} player lookups''')
+    send(f'''\
+Messages: {len(messageCache)} rendered, {messageCache.hits} hits, \
+{messageCache.misses} misses''')
+    if payloadFingerprints.checked:
+        send('Unchanged payloads skipped: ' + ', '.join(
+            f'{payloadFingerprints.skipped.get(kind, 0)}/{checked} {kind}'
+            for kind, checked in sorted(payloadFingerprints.checked.items())))
+    if leaderboardChanges:
+        send('Leaderboard changes: ' + ', '.join(
+            f'{count} {kind}' for kind, count
+            in sorted(leaderboardChanges.items())))
+    send(f'''\
+Coalesced: {requestFlights.duplicates}/{requestFlights.requests} requests, \
+{refreshFlights.duplicates}/{refreshFlights.requests} refreshes''')
+    send(f'''\
+Channel settings: {len(settingsCache.entries)} cached, \
+{settingsCache.hits} hits, {settingsCache.misses} misses, \
+{len(resolvedLeaderboards)} resolved leaderboards''')
+    send(f'''\
+Twitch games: {len(twitchGameCache.entries)} cached, \
+{twitchGameCache.hits} hits, {twitchGameCache.misses} misses''')
+    name: str
+    for name in sorted(poolUsage.acquires):
+        send(f'''\
+Database {name}: {poolUsage.acquires[name]} acquires, \
+{poolUsage.average(name) * 1000:.1f}ms average hold, \
+{poolUsage.longest[name] * 1000:.1f}ms longest hold''')
+
+
+def resolve_leaderboard(settings: speedrunsettings.ChannelSettings,
+                        game: speedrundata.Game
+                        ) -> speedrunsettings.ResolvedLeaderboard:
+    key: Tuple[str, int, int] = game.id, game.version, settings.version
+    resolved: Optional[speedrunsettings.ResolvedLeaderboard]
+    resolved = resolvedLeaderboards.get(settings.channel)
+    if resolved is not None and resolved.current(settings, key):
+        return resolved
+
+    categories: Dict[str, speedrundata.Category] = game.game_categories
+    levelId: Optional[str] = settings.levelid(game.id)
+    level: Optional[speedrundata.Level] = game.levels.get(levelId)
+    if level is not None:
+        categories = level.categories
+
+    categoryId: Optional[str] = settings.categoryid(game.id, levelId)
+    if categoryId is None:
+        categoryId = default_categoryid(categories)
+    id: Optional[speedrundata.LeaderboardId] = None
+    if categoryId is not None:
+        variables_: Dict[str, str] = default_sub_categories(game, levelId,
+                                                            categoryId)
+        variables_.update(channel_variable_values(settings, game.id, levelId,
+                                                  categoryId))
+        id = speedrundata.LeaderboardId(
+            game.id, levelId, categoryId, settings.regionid(game.id),
+            settings.platformid(game.id), variables_)
+    resolved = speedrunsettings.ResolvedLeaderboard(
+        settings, key, levelId, categoryId, categories, id)
+    resolvedLeaderboards[settings.channel] = resolved
+    return resolved
+
+
 def default_categoryid(categories: Dict[str, speedrundata.Category]
                        ) -> Optional[str]:
     for id, category in categories.items():
@@ -944,6 +1879,46 @@ def format_ordinal(number: int) -> str:
 
 def messages_world_records(id: speedrundata.LeaderboardId,
                            runIds: List[str]) -> Generator[str, None, None]:
+    yield from messageCache.get(
+        id, ('full', tuple(runIds)),
+        lambda: render_world_records(id, runIds))
+
+
+def messages_world_records_lite(id: speedrundata.LeaderboardId,
+                                runIds: List[str]
+                                ) -> Generator[str, None, None]:
+    yield from messageCache.get(
+        id, ('lite', tuple(runIds)),
+        lambda: render_world_records_lite(id, runIds))
+
+
+def messages_personal_best(id: speedrundata.LeaderboardId,
+                           runId: Optional[str],
+                           chat: 'data.Channel') -> Generator[str, None, None]:
+    yield from messageCache.get(
+        id, ('full', runId, personal_best_owner(runId, chat)),
+        lambda: render_personal_best(id, runId, chat))
+
+
+def messages_personal_best_lite(id: speedrundata.LeaderboardId,
+                                runId: Optional[str],
+                                chat: 'data.Channel'
+                                ) -> Generator[str, None, None]:
+    yield from messageCache.get(
+        id, ('lite', runId, personal_best_owner(runId, chat)),
+        lambda: render_personal_best_lite(id, runId, chat))
+
+
+def personal_best_owner(runId: Optional[str],
+                        chat: 'data.Channel') -> Optional[str]:
+    # Only the "no personal best" message names the channel
+    if runId is None or runId not in runs:
+        return chat.channel
+    return None
+
+
+def render_world_records(id: speedrundata.LeaderboardId,
+                         runIds: List[str]) -> Generator[str, None, None]:
     game: speedrundata.Game = games[id.gameid]
     level: Optional[speedrundata.Level] = levels[id.levelid]
     category: speedrundata.Category = categories[id.categoryid]
@@ -959,7 +1934,7 @@ No Record have been set for \
 '{game.internationalName} - {levelText}{category.name}' \
 on speedrun.com'''
     elif len(runIds) == 1:
-        time = int(runs[runIds[0]].time.total_seconds())
+        time = runs[runIds[0]].time // 1000
         run = runs[runIds[0]]
         playerNames: str = run_players(runIds[0], True)
         date = ''
@@ -973,7 +1948,7 @@ The world record for \
 by {playerNames} with a time of {format_seconds(time)} \
 {date}- {run.weblink}'''
     elif len(runIds) < 4:
-        time = int(runs[runIds[0]].time.total_seconds())
+        time = runs[runIds[0]].time // 1000
         yield f'''\
 The world record for \
 '{game.internationalName} - {levelText}{category.name}' \
@@ -989,7 +1964,7 @@ has a {len(runIds)} with a time of {format_seconds(time)} '''
                 date = f'submitted on {run.submitted.strftime(dateFormat)} '
             yield f'By {players} {date}- {run.weblink}'
     else:
-        time = int(runs[runIds[0]].time.total_seconds())
+        time = runs[runIds[0]].time // 1000
         yield f'''\
 The world record for \
 '{game.internationalName} - {levelText}{category.name}' \
@@ -998,9 +1973,9 @@ has a {len(runIds)} with a time of {format_seconds(time)}'''
                                              prepend='By: ')
 
 
-def messages_world_records_lite(id: speedrundata.LeaderboardId,
-                                runIds: List[str]
-                                ) -> Generator[str, None, None]:
+def render_world_records_lite(id: speedrundata.LeaderboardId,
+                              runIds: List[str]
+                              ) -> Generator[str, None, None]:
     game: speedrundata.Game = games[id.gameid]
     level: Optional[speedrundata.Level] = levels[id.levelid]
     category: speedrundata.Category = categories[id.categoryid]
@@ -1012,7 +1987,7 @@ def messages_world_records_lite(id: speedrundata.LeaderboardId,
 No Record have been set for \
 '{game.internationalName} - {levelText}{category.name}' on speedrun.com'''
     else:
-        time: int = int(runs[runIds[0]].time.total_seconds())
+        time: int = runs[runIds[0]].time // 1000
         playerNames: str = ', '.join(map(run_players, runIds))
         if len(runIds) == 1:
             yield f'''\
@@ -1024,9 +1999,9 @@ WR is {format_seconds(time)} by {playerNames}'''
 WR is {format_seconds(time)} by {playerNames} ({len(runIds)}-way tie)'''
 
 
-def messages_personal_best(id: speedrundata.LeaderboardId,
-                           runId: Optional[str],
-                           chat: 'data.Channel') -> Generator[str, None, None]:
+def render_personal_best(id: speedrundata.LeaderboardId,
+                         runId: Optional[str],
+                         chat: 'data.Channel') -> Generator[str, None, None]:
     game: speedrundata.Game = games[id.gameid]
     level: Optional[speedrundata.Level] = levels[id.levelid]
     category: speedrundata.Category = categories[id.categoryid]
@@ -1034,13 +2009,13 @@ def messages_personal_best(id: speedrundata.LeaderboardId,
     levelText: str = ''
     if level is not None:
         levelText = f'{level.name} - '
-    if runId is None or runId not in runs:
+    if runId is None or runId not in runs or runId not in leaderboard.rowByRun:
         yield f'''\
 {chat.channel} has no personal best in \
 '{game.internationalName} - {levelText}{category.name}'\
 '''
         return
-    time: int = int(runs[runId].time.total_seconds())
+    time: int = runs[runId].time // 1000
     run: speedrundata.Run = runs[runId]
     playerNames: str = run_players(runId)
     date: str = ''
@@ -1048,7 +2023,8 @@ def messages_personal_best(id: speedrundata.LeaderboardId,
         date = f'on {run.date.strftime(dateFormat)} '
     elif run.submitted is not None:
         date = f'submitted on {run.submitted.strftime(dateFormat)} '
-    place: str = format_ordinal(leaderboard.place[runId])
+    place: str = format_ordinal(
+        leaderboard.places[leaderboard.rowByRun[runId]])
     yield f'''\
 The personal best in \
 '{game.internationalName} - {levelText}{category.name}' \
@@ -1056,10 +2032,10 @@ by {playerNames} with a time of {format_seconds(time)} in {place} place \
 {date} - {run.weblink}'''
 
 
-def messages_personal_best_lite(id: speedrundata.LeaderboardId,
-                                runId: Optional[str],
-                                chat: 'data.Channel'
-                                ) -> Generator[str, None, None]:
+def render_personal_best_lite(id: speedrundata.LeaderboardId,
+                              runId: Optional[str],
+                              chat: 'data.Channel'
+                              ) -> Generator[str, None, None]:
     game: speedrundata.Game = games[id.gameid]
     level: Optional[speedrundata.Level] = levels[id.levelid]
     category: speedrundata.Category = categories[id.categoryid]
@@ -1067,17 +2043,18 @@ def messages_personal_best_lite(id: speedrundata.LeaderboardId,
     levelText: str = ''
     if level is not None:
         levelText = f'{level.name} - '
-    if runId is None or runId not in runs:
+    if runId is None or runId not in runs or runId not in leaderboard.rowByRun:
         yield f'''\
 {chat.channel} has no personal best in \
 '{game.internationalName} - {levelText}{category.name}'\
 '''
         return
-    time: int = int(runs[runId].time.total_seconds())
+    time: int = runs[runId].time // 1000
     run: speedrundata.Run = runs[runId]
     playerNames: str
     playerNames = f' by {run_players(runId)}' if len(run.playerids) > 1 else ''
-    place: str = format_ordinal(leaderboard.place[runId])
+    place: str = format_ordinal(
+        leaderboard.places[leaderboard.rowByRun[runId]])
     yield f'''
 {game.internationalName} - {levelText}{category.name}'\
  PB is {format_seconds(time)} in {place} place {playerNames}'''
@@ -1086,33 +2063,14 @@ def messages_personal_best_lite(id: speedrundata.LeaderboardId,
 def valid_variables(game: speedrundata.Game,
                     levelId: Optional[str],
                     categoryId: Optional[str]
-                    ) -> Generator[speedrundata.Variable, None, None]:
-    variable: speedrundata.Variable
-    for variable in game.variables.values():
-        if variable.scope == 'full-game':
-            if levelId is not None:
-                continue
-        elif variable.scope == 'all-levels':
-            if levelId is None:
-                continue
-        elif variable.scope == 'single-level':
-            if levelId != variable.levelId:
-                continue
-        elif variable.scope != 'global':
-            continue
-        if (variable.categoryId is not None
-                and variable.categoryId != categoryId):
-            continue
-        yield variable
+                    ) -> Tuple[speedrundata.Variable, ...]:
+    return game.variable_scope(levelId, categoryId).variables
 
 
 def default_sub_categories(game: speedrundata.Game,
                            levelId: Optional[str],
                            categoryId: Optional[str]) -> Dict[str, str]:
-    variables: Dict[str, str] = {}
-    variable: speedrundata.Variable
-    for variable in valid_variables(game, levelId, categoryId):
-        if not variable.sub_category:
-            continue
-        variables[variable.id] = variable.default
-    return variables
+    return dict(game.variable_scope(levelId, categoryId).defaults)
+
+
+add_leaderboard_listener(invalidate_messages)
@@ -1,13 +1,27 @@
-﻿from collections import OrderedDict
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Union  # noqa: F401
+﻿import bisect
+import sys
+import weakref
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union  # noqa: F401,E501
 
 baseApi: str = 'http://www.speedrun.com'
 
 
+def intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+def milliseconds(seconds: float) -> int:
+    return round(seconds * 1000)
+
+
 class Platform:
+    __slots__ = ('id', 'name')
+
     def __init__(self, data: Dict[str, Any]) -> None:
-        self.id: str = data['id']
+        self.id: str = sys.intern(data['id'])
         self.update(data)
 
     def update(self, data: Dict[str, Any]) -> None:
@@ -17,8 +31,10 @@ class Platform:
 
 
 class Region:
+    __slots__ = ('id', 'name')
+
     def __init__(self, data: Dict[str, Any]) -> None:
-        self.id: str = data['id']
+        self.id: str = sys.intern(data['id'])
         self.update(data)
 
     def update(self, data: Dict[str, Any]) -> None:
@@ -33,9 +49,12 @@ class Game:
         self.levels: Dict[Optional[str], Optional[Level]] = {None: None}
         self.level_categories: Dict[str, Category] = OrderedDict()
         self.variables: Dict[str, Variable] = OrderedDict()
+        self.variableScopes: Dict[Tuple[Optional[str], Optional[str]],
+                                  VariableScope] = {}
         self.regions: List[str] = []
         self.platforms: List[str] = []
         self.id: str = data['id']
+        self.version: int = 0
         self.update(data)
 
     def update(self, data: Dict[str, Any]) -> None:
@@ -51,12 +70,60 @@ class Game:
         self.platforms.clear()
         self.platforms.extend(data['platforms'])
 
+    def index_variables(self) -> None:
+        self.variableScopes.clear()
+        scopes: Dict[Tuple[Variable, ...], VariableScope] = {}
+        byLevelVariables: Dict[Tuple[Variable, ...],
+                               Dict[str, VariableScope]] = {}
+        # Levels without single-level variables all share anyLevel
+        anyLevel: Tuple[Variable, ...] = tuple(
+            v for v in self.variables.values()
+            if v.scope in ('global', 'all-levels'))
+        singleLevels: Set[Optional[str]] = {
+            v.levelId for v in self.variables.values()
+            if v.scope == 'single-level'}
+        levelId: Optional[str]
+        level: Optional[Level]
+        for levelId, level in self.levels.items():
+            categories: Dict[str, Category] = self.game_categories
+            if level is not None:
+                categories = level.categories
+            levelVariables: Tuple[Variable, ...] = anyLevel
+            if level is None or levelId in singleLevels:
+                levelVariables = tuple(v for v in self.variables.values()
+                                       if v.applies_level(levelId))
+            byCategory: Dict[str, VariableScope]
+            byCategory = byLevelVariables.setdefault(levelVariables, {})
+            categoryId: str
+            for categoryId in categories:
+                if categoryId not in byCategory:
+                    applicable: Tuple[Variable, ...] = tuple(
+                        v for v in levelVariables
+                        if v.applies_category(categoryId))
+                    if applicable not in scopes:
+                        scopes[applicable] = VariableScope(applicable)
+                    byCategory[categoryId] = scopes[applicable]
+                scope: VariableScope = byCategory[categoryId]
+                self.variableScopes[levelId, categoryId] = scope
+
+    def variable_scope(self,
+                       levelId: Optional[str],
+                       categoryId: Optional[str]) -> 'VariableScope':
+        key: Tuple[Optional[str], Optional[str]] = levelId, categoryId
+        if key not in self.variableScopes:
+            self.variableScopes[key] = VariableScope(tuple(
+                v for v in self.variables.values()
+                if v.applies(levelId, categoryId)))
+        return self.variableScopes[key]
+
 
 class Level:
+    __slots__ = ('id', 'game', 'categories', 'name', 'weblink')
+
     def __init__(self,
                  game: Game,
                  data: Dict[str, Any]) -> None:
-        self.id: str = data['id']
+        self.id: str = sys.intern(data['id'])
         self.game: Game = game
         self.categories: Dict[str, Category] = OrderedDict()
         self.update(data)
@@ -69,10 +136,12 @@ class Level:
 
 
 class Category:
+    __slots__ = ('id', 'game', 'name', 'type', 'weblink', 'miscellaneous')
+
     def __init__(self,
                  game: Game,
                  data: Dict[str, Any]) -> None:
-        self.id: str = data['id']
+        self.id: str = sys.intern(data['id'])
         self.game: Game = game
         self.update(data)
 
@@ -80,25 +149,28 @@ class Category:
         if self.id != data['id']:
             raise ValueError()
         self.name: str = data['name']
-        self.type: str = data['type']
+        self.type: str = sys.intern(data['type'])
         self.weblink: str = data['weblink']
         self.miscellaneous: bool = data['miscellaneous']
 
 
 class Variable:
+    __slots__ = ('id', 'name', 'categoryId', 'levelId', 'scope', 'required',
+                 'sub_category', 'user_defined', 'values', 'default')
+
     def __init__(self, data: Dict[str, Any]) -> None:
-        self.id: str = data['id']
+        self.id: str = sys.intern(data['id'])
         self.update(data)
 
     def update(self, data: Dict[str, Any]) -> None:
         if self.id != data['id']:
             raise ValueError()
         self.name: str = data['name']
-        self.categoryId: Optional[str] = data['category']
+        self.categoryId: Optional[str] = intern(data['category'])
         self.levelId: Optional[str] = None
         if 'level' in data['scope']:
-            self.levelId = data['scope']['level']
-        self.scope: str = data['scope']['type']
+            self.levelId = intern(data['scope']['level'])
+        self.scope: str = sys.intern(data['scope']['type'])
         self.required: bool = data['mandatory']
         self.sub_category: bool = data['is-subcategory']
         self.user_defined: bool = data['user-defined']
@@ -106,26 +178,61 @@ class Variable:
         valueId: str
         valueData: Dict[str, Any]
         for valueId, valueData in data['values']['values'].items():
-            self.values[valueId] = valueData['label']
-        self.default: str = data['values']['default']
+            self.values[sys.intern(valueId)] = valueData['label']
+        self.default: Optional[str] = intern(data['values']['default'])
+
+    def applies(self,
+                levelId: Optional[str],
+                categoryId: Optional[str]) -> bool:
+        return (self.applies_level(levelId)
+                and self.applies_category(categoryId))
+
+    def applies_level(self, levelId: Optional[str]) -> bool:
+        if self.scope == 'full-game':
+            return levelId is None
+        if self.scope == 'all-levels':
+            return levelId is not None
+        if self.scope == 'single-level':
+            return levelId == self.levelId
+        return self.scope == 'global'
+
+    def applies_category(self, categoryId: Optional[str]) -> bool:
+        return self.categoryId is None or self.categoryId == categoryId
+
+
+class VariableScope:
+    __slots__ = ('variables', 'defaults')
+
+    def __init__(self, variables: Tuple[Variable, ...]) -> None:
+        self.variables: Tuple[Variable, ...] = variables
+        self.defaults: Dict[str, str] = {
+            v.id: v.default for v in variables
+            if v.sub_category and v.default is not None}
 
 
 class Runner:
+    __slots__ = ('name',)
+
     def __init__(self, *, name: str) -> None:
         self.name: str = name
 
 
 class Guest(Runner):
+    __slots__ = ()
+
     def __init__(self, data: Dict[str, Any]) -> None:
         super().__init__(name=data['name'])
 
 
 class Player(Runner):
+    __slots__ = ('id', 'api', 'japaneseName', 'weblink', 'twitchUrl',
+                 'twitch')
+
     twitchTvBaseUrl: str = 'https://www.twitch.tv/'
 
     def __init__(self, data: Dict[str, Any]) -> None:
         super().__init__(name=data['names']['international'])
-        self.id: str = data['id']
+        self.id: str = sys.intern(data['id'])
         self.api: str = ''
         self.update(data)
 
@@ -147,11 +254,15 @@ class Player(Runner):
 
 
 class Run:
+    __slots__ = ('id', 'gameid', 'levelid', 'categoryid', 'playerids',
+                 'weblink', 'dateText', 'submittedText', 'time', 'realtime_t',
+                 'realtime_noloads_t', 'ingame_t')
+
     def __init__(self, data: Dict[str, Any]) -> None:
         self.id: str = data['id']
-        self.gameid: str = data['game']
-        self.levelid: Optional[str] = data['level']
-        self.categoryid: str = data['category']
+        self.gameid: str = sys.intern(data['game'])
+        self.levelid: Optional[str] = intern(data['level'])
+        self.categoryid: str = sys.intern(data['category'])
         self.playerids: List[Union[str, Guest]] = []
         self.update(data)
 
@@ -165,43 +276,100 @@ class Run:
         if self.categoryid != data['category']:
             raise ValueError()
         self.weblink: str = data['weblink']
-        self.date: Optional[datetime] = None
-        if data['date'] is not None:
-            self.date = datetime.strptime(data['date'], '%Y-%m-%d')
-        self.submitted: Optional[datetime] = None
-        if data['submitted'] is not None:
-            self.submitted = datetime.strptime(data['submitted'],
-                                               '%Y-%m-%dT%H:%M:%SZ')
-        self.time: timedelta = timedelta(seconds=data['times']['primary_t'])
-        self.realtime: timedelta
-        self.realtime = timedelta(seconds=data['times']['realtime_t'])
-        self.realtime_noload: timedelta = timedelta(
-            seconds=data['times']['realtime_noloads_t'])
-        self.ingametime: timedelta
-        self.ingametime = timedelta(seconds=data['times']['ingame_t'])
+        # Dates and secondary times are decoded when read
+        self.dateText: Optional[str] = data['date']
+        self.submittedText: Optional[str] = data['submitted']
+        self.time: int = milliseconds(data['times']['primary_t'])
+        self.realtime_t: float = data['times']['realtime_t']
+        self.realtime_noloads_t: float = data['times']['realtime_noloads_t']
+        self.ingame_t: float = data['times']['ingame_t']
         self.playerids.clear()
         player: Dict[str, Any]
         for player in data['players']:
             if player['rel'] == 'guest':
                 self.playerids.append(Guest(player))
             else:
-                self.playerids.append(player['id'])
+                self.playerids.append(sys.intern(player['id']))
+
+    @property
+    def date(self) -> Optional[datetime]:
+        if self.dateText is None:
+            return None
+        return datetime.strptime(self.dateText, '%Y-%m-%d')
+
+    @property
+    def submitted(self) -> Optional[datetime]:
+        if self.submittedText is None:
+            return None
+        return datetime.strptime(self.submittedText, '%Y-%m-%dT%H:%M:%SZ')
+
+    @property
+    def realtime(self) -> int:
+        return milliseconds(self.realtime_t)
+
+    @property
+    def realtime_noload(self) -> int:
+        return milliseconds(self.realtime_noloads_t)
+
+    @property
+    def ingametime(self) -> int:
+        return milliseconds(self.ingame_t)
 
 
 class LeaderboardId:
-    def __init__(self,
-                 gameid: str,
-                 levelid: Optional[str],
-                 categoryid: str,
-                 regionid: Optional[str],
-                 platformid: Optional[str],
-                 variables: Dict[str, str]) -> None:
-        self.gameid: str = gameid
-        self.levelid: Optional[str] = levelid
-        self.categoryid: str = categoryid
-        self.regionid: Optional[str] = regionid
-        self.platformid: Optional[str] = platformid
-        self.variables: Dict[str, str] = variables
+    __slots__ = ('gameid', 'levelid', 'categoryid', 'regionid', 'platformid',
+                 'variables', 'key', 'hash', '__weakref__')
+
+    gameid: str
+    levelid: Optional[str]
+    categoryid: str
+    regionid: Optional[str]
+    platformid: Optional[str]
+    variables: Tuple[Tuple[str, Optional[str]], ...]
+    key: Tuple[Any, ...]
+    hash: int
+
+    interned: 'weakref.WeakValueDictionary[Tuple[Any, ...], LeaderboardId]'
+    interned = weakref.WeakValueDictionary()
+
+    def __new__(cls,
+                gameid: str,
+                levelid: Optional[str],
+                categoryid: str,
+                regionid: Optional[str],
+                platformid: Optional[str],
+                variables: Union[Mapping[str, Optional[str]],
+                                 Iterable[Tuple[str, Optional[str]]]]
+                ) -> 'LeaderboardId':
+        if isinstance(variables, Mapping):
+            variables = variables.items()
+        values: Tuple[Tuple[str, Optional[str]], ...] = tuple(sorted(
+            (sys.intern(k), intern(v)) for k, v in variables))
+        key: Tuple[Any, ...] = (sys.intern(gameid), intern(levelid),
+                                sys.intern(categoryid), intern(regionid),
+                                intern(platformid), values)
+        self: Optional[LeaderboardId] = cls.interned.get(key)
+        if self is None:
+            self = super().__new__(cls)
+            object.__setattr__(self, 'gameid', key[0])
+            object.__setattr__(self, 'levelid', key[1])
+            object.__setattr__(self, 'categoryid', key[2])
+            object.__setattr__(self, 'regionid', key[3])
+            object.__setattr__(self, 'platformid', key[4])
+            object.__setattr__(self, 'variables', values)
+            object.__setattr__(self, 'key', key)
+            object.__setattr__(self, 'hash', hash(key))
+            cls.interned[key] = self
+        return self
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('LeaderboardId is immutable')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('LeaderboardId is immutable')
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return LeaderboardId, self.key
 
     @staticmethod
     def fromObjects(game: Game,
@@ -214,17 +382,30 @@ class LeaderboardId:
                              platform.id, {})
 
     def __hash__(self) -> int:
-        return hash((self.gameid, self.levelid, self.categoryid,
-                     self.regionid, self.platformid,
-                     frozenset(self.variables.items())))
+        return self.hash
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, LeaderboardId):
             return False
-        return ((self.gameid, self.levelid, self.categoryid, self.regionid,
-                 self.platformid, self.variables)
-                == (other.gameid, other.levelid, other.categoryid,
-                    other.regionid, other.platformid, other.variables))
+        return self.key == other.key
+
+
+# kind is world-record, personal-best, places-shifted, runs-removed or
+# run-updated; updated is sent when rows changed in none of those ways
+class LeaderboardChange:
+    def __init__(self,
+                 kind: str,
+                 runId: Optional[str]=None,
+                 playerId: Optional[str]=None,
+                 previousRunId: Optional[str]=None,
+                 count: int=0) -> None:
+        self.kind: str = kind
+        self.runId: Optional[str] = runId
+        self.playerId: Optional[str] = playerId
+        self.previousRunId: Optional[str] = previousRunId
+        self.count: int = count
 
 
 class Leaderboard:
@@ -235,28 +416,163 @@ class Leaderboard:
         self.levelid: Optional[str] = data['level']
         self.categoryid: str = data['category']
         self.weblink: str = data['weblink']
-        self.runs: Dict[str, Run] = {}
-        self.place: Dict[str, int] = OrderedDict()
-        self.runs_by_player: Dict[str, str] = {}
+        # Rows are in leaderboard order, so places and times are sorted
+        self.runIds: List[str] = []
+        self.places: array = array('I')
+        self.times: array = array('q')
+        self.playerIndex: array = array('i')
+        self.players: List[str] = []
+        self.rowByRun: Dict[str, int] = {}
+        self.rowByPlayer: Dict[str, int] = {}
+        self.version: int = 0
         link: Dict[str, str]
         for link in data['links']:
             if link['rel'] == 'self':
                 self.api = link['uri']
         self.api: str = uri
 
+    def __len__(self) -> int:
+        return len(self.runIds)
+
     def add_run(self,
                 place: int,
                 run: Run) -> None:
-        self.runs[run.id] = run
-        self.place[run.id] = place
+        row: int = len(self.runIds)
+        self.runIds.append(run.id)
+        self.places.append(place)
+        self.times.append(run.time)
+        self.rowByRun[run.id] = row
+        self.playerIndex.append(len(self.players))
+        player: Union[str, Guest]
+        for player in run.playerids:
+            if isinstance(player, str):
+                self.players.append(player)
+                if player not in self.rowByPlayer:
+                    self.rowByPlayer[player] = row
+
+    def same_players(self,
+                     row: int,
+                     run: Run) -> bool:
+        index: int = self.playerIndex[row]
+        end: int = len(self.players)
+        if row + 1 < len(self.playerIndex):
+            end = self.playerIndex[row + 1]
         player: Union[str, Guest]
         for player in run.playerids:
             if isinstance(player, str):
-                if player in self.runs_by_player:
-                    continue
-                self.runs_by_player[player] = run.id
+                if index == end or self.players[index] != player:
+                    return False
+                index += 1
+        return index == end
 
     def reset(self) -> None:
-        self.runs.clear()
-        self.place.clear()
-        self.runs_by_player.clear()
+        self.truncate(0)
+
+    def truncate(self, rows: int) -> None:
+        runId: str
+        for runId in self.runIds[rows:]:
+            del self.rowByRun[runId]
+        player: str
+        for player in [p for p, r in self.rowByPlayer.items() if r >= rows]:
+            del self.rowByPlayer[player]
+        if rows < len(self.playerIndex):
+            del self.players[self.playerIndex[rows]:]
+        del self.runIds[rows:]
+        del self.places[rows:]
+        del self.times[rows:]
+        del self.playerIndex[rows:]
+
+    def update(self, rows: List[Tuple[int, Run]]) -> List[LeaderboardChange]:
+        first: int = 0
+        limit: int = min(len(rows), len(self.runIds))
+        place: int
+        run: Run
+        while first < limit:
+            place, run = rows[first]
+            if (self.runIds[first] != run.id
+                    or self.places[first] != place
+                    or self.times[first] != run.time
+                    or not self.same_players(first, run)):
+                break
+            first += 1
+        if first == len(rows) == len(self.runIds):
+            return []
+
+        oldRecords: List[str] = self.world_records()
+        oldPlaces: Dict[str, int] = {}
+        oldTimes: Dict[str, int] = {}
+        row: int
+        for row in range(first, len(self.runIds)):
+            oldPlaces[self.runIds[row]] = self.places[row]
+            oldTimes[self.runIds[row]] = self.times[row]
+        oldBest: Dict[str, str] = {p: self.runIds[r]
+                                   for p, r in self.rowByPlayer.items()
+                                   if r >= first}
+
+        self.truncate(first)
+        for place, run in rows[first:]:
+            self.add_run(place, run)
+        self.version += 1
+
+        changes: List[LeaderboardChange] = []
+        records: List[str] = self.world_records()
+        if records and records != oldRecords:
+            changes.append(LeaderboardChange(
+                'world-record', records[0],
+                previousRunId=oldRecords[0] if oldRecords else None))
+        player: str
+        for player, row in self.rowByPlayer.items():
+            if row < first:
+                continue
+            runId: str = self.runIds[row]
+            previous: Optional[str] = oldBest.get(player)
+            if previous == runId:
+                continue
+            if previous is None or self.times[row] < oldTimes[previous]:
+                changes.append(LeaderboardChange(
+                    'personal-best', runId, player, previous))
+        shifted: int = sum(1 for r, p in oldPlaces.items()
+                           if r in self.rowByRun and self.place(r) != p)
+        if shifted:
+            changes.append(LeaderboardChange('places-shifted', count=shifted))
+        removed: int = sum(1 for r in oldPlaces if r not in self.rowByRun)
+        if removed:
+            changes.append(LeaderboardChange('runs-removed', count=removed))
+        if not changes:
+            changes.append(LeaderboardChange('updated'))
+        return changes
+
+    def world_records(self) -> List[str]:
+        return self.top(1)
+
+    def top(self, places: int) -> List[str]:
+        return self.runIds[:bisect.bisect_right(self.places, places)]
+
+    def personal_best(self, playerId: str) -> Optional[str]:
+        if playerId not in self.rowByPlayer:
+            return None
+        return self.runIds[self.rowByPlayer[playerId]]
+
+    def place(self, runId: str) -> Optional[int]:
+        if runId not in self.rowByRun:
+            return None
+        return self.places[self.rowByRun[runId]]
+
+    def rank(self, time: int) -> int:
+        row: int = bisect.bisect_left(self.times, time)
+        if row < len(self.times) and self.times[row] == time:
+            return self.places[row]
+        return row + 1
+
+    def percentile(self, runId: str) -> Optional[float]:
+        if runId not in self.rowByRun:
+            return None
+        beaten: int = len(self.places) - bisect.bisect_right(
+            self.places, self.places[self.rowByRun[runId]])
+        return 100 * beaten / len(self.places)
+
+    def time_for_place(self, place: int) -> Optional[int]:
+        row: int = bisect.bisect_right(self.places, place) - 1
+        if row < 0:
+            return None
+        return self.times[row]
@@ -0,0 +1,70 @@
+﻿import math
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, Optional, Set, Tuple  # noqa: F401
+
+
+class Demand:
+    def __init__(self, halfLife: timedelta) -> None:
+        self.halfLife: float = halfLife.total_seconds()
+        self.hits: Dict[Hashable, Tuple[float, datetime]] = {}
+        self.channels: Dict[Hashable, Set[str]] = {}
+
+    def score(self,
+              key: Hashable,
+              timestamp: datetime) -> float:
+        if key not in self.hits:
+            return 0.0
+        hits: float
+        updated: datetime
+        hits, updated = self.hits[key]
+        elapsed: float = max((timestamp - updated).total_seconds(), 0.0)
+        return hits * math.pow(0.5, elapsed / self.halfLife)
+
+    def hit(self,
+            key: Hashable,
+            timestamp: datetime,
+            channel: Optional[str]=None) -> None:
+        self.hits[key] = self.score(key, timestamp) + 1, timestamp
+        if channel is not None:
+            self.own(key, channel)
+
+    def own(self,
+            key: Hashable,
+            channel: str) -> None:
+        if key not in self.channels:
+            self.channels[key] = set()
+        self.channels[key].add(channel)
+
+    def owners(self, key: Hashable) -> Set[str]:
+        return self.channels.get(key, set())
+
+    def prune(self, keep: Callable[[Hashable], bool]) -> None:
+        key: Hashable
+        for key in [k for k in self.hits if not keep(k)]:
+            del self.hits[key]
+        for key in [k for k in self.channels if not keep(k)]:
+            del self.channels[key]
+
+
+class Candidate:
+    def __init__(self,
+                 kind: str,
+                 id: Hashable,
+                 refreshed: datetime,
+                 score: float) -> None:
+        self.kind: str = kind
+        self.id: Hashable = id
+        self.refreshed: datetime = refreshed
+        self.score: float = score
+
+
+def score(staleness: float,
+          weight: float,
+          hits: float,
+          recency: float,
+          streaming: bool,
+          streamingBoost: float) -> float:
+    value: float = weight * staleness * (1 + hits) * (1 + recency)
+    if streaming:
+        value *= streamingBoost
+    return value
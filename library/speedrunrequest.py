@@ -0,0 +1,242 @@
+﻿import asyncio
+import math
+import random
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar  # noqa: F401,E501
+
+T = TypeVar('T')
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self,
+                 capacity: int,
+                 period: timedelta,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        self.capacity: int = capacity
+        self.rate: float = capacity / period.total_seconds()
+        self.clock: Callable[[], float] = clock
+        self.tokens: float = float(capacity)
+        self.updated: float = clock()
+
+    def refill(self) -> None:
+        now: float = self.clock()
+        self.tokens = min(float(self.capacity),
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def remaining(self) -> int:
+        self.refill()
+        return max(math.floor(self.tokens), 0)
+
+    def consume(self, tokens: int=1) -> None:
+        self.refill()
+        self.tokens -= tokens
+
+    def try_consume(self, tokens: int=1) -> bool:
+        self.refill()
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def wait_time(self, tokens: int=1) -> float:
+        self.refill()
+        return max(tokens - self.tokens, 0.0) / self.rate
+
+    def reset_time(self) -> float:
+        self.refill()
+        return (self.capacity - self.tokens) / self.rate
+
+
+class Backoff:
+    def __init__(self,
+                 base: float,
+                 maximum: float,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        self.base: float = base
+        self.maximum: float = maximum
+        self.clock: Callable[[], float] = clock
+        self.failures: Dict[str, int] = {}
+        self.retryAt: Dict[str, float] = {}
+
+    def failure(self, endpoint: str) -> float:
+        self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+        delay: float = min(self.base * 2 ** (self.failures[endpoint] - 1),
+                           self.maximum)
+        delay = random.uniform(delay / 2, delay)
+        self.retryAt[endpoint] = self.clock() + delay
+        return delay
+
+    def success(self, endpoint: str) -> None:
+        self.failures.pop(endpoint, None)
+        self.retryAt.pop(endpoint, None)
+
+    def wait_time(self, endpoint: str) -> float:
+        if endpoint not in self.retryAt:
+            return 0.0
+        return max(self.retryAt[endpoint] - self.clock(), 0.0)
+
+
+class CircuitBreaker:
+    def __init__(self,
+                 threshold: int,
+                 cooldown: float,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        self.threshold: int = threshold
+        self.cooldown: float = cooldown
+        self.clock: Callable[[], float] = clock
+        self.state: str = 'closed'
+        self.failures: int = 0
+        self.openedAt: float = 0.0
+        self.probing: bool = False
+
+    def retry_time(self) -> float:
+        if self.state != 'open':
+            return 0.0
+        return max(self.openedAt + self.cooldown - self.clock(), 0.0)
+
+    def available(self) -> bool:
+        if self.state == 'closed':
+            return True
+        if self.state == 'open':
+            return self.retry_time() <= 0
+        return not self.probing
+
+    def allow(self) -> bool:
+        if not self.available():
+            return False
+        if self.state != 'closed':
+            self.state = 'half-open'
+            self.probing = True
+        return True
+
+    def cancel(self) -> None:
+        self.probing = False
+
+    def success(self) -> None:
+        self.state = 'closed'
+        self.failures = 0
+        self.probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.state == 'half-open' or self.failures >= self.threshold:
+            self.state = 'open'
+            self.openedAt = self.clock()
+
+
+class Lane:
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.promoted: asyncio.Event = asyncio.Event()
+        self.joined: List['Lane'] = []
+
+    def join(self, other: 'Lane') -> None:
+        # A flight runs for everyone waiting on it, so it takes the fastest
+        # lane of anyone who joins, even after it has been queued
+        other.joined.append(self)
+        if other.name == 'interactive':
+            self.promote()
+
+    def promote(self) -> None:
+        if self.name == 'interactive':
+            return
+        self.name = 'interactive'
+        self.promoted.set()
+        lane: Lane
+        for lane in self.joined:
+            lane.promote()
+
+    async def sleep(self, delay: float) -> None:
+        if self.promoted.is_set():
+            await asyncio.sleep(delay)
+            return
+        try:
+            await asyncio.wait_for(self.promoted.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+
+class RequestScheduler:
+    def __init__(self,
+                 limiter: TokenBucket,
+                 reserved: int) -> None:
+        self.limiter: TokenBucket = limiter
+        self.reserved: int = reserved
+        self.waiting: Dict[str, int] = {'interactive': 0, 'background': 0}
+
+    def available(self, lane: str) -> bool:
+        if lane == 'interactive':
+            return self.limiter.remaining() >= 1
+        if self.waiting['interactive']:
+            return False
+        return self.limiter.remaining() > self.reserved
+
+    def wait_time(self, lane: str) -> float:
+        if lane == 'interactive':
+            return self.limiter.wait_time()
+        return max(self.limiter.wait_time(self.reserved + 1),
+                   1 / self.limiter.rate)
+
+    async def acquire(self,
+                      lane: Lane,
+                      deadline: float) -> None:
+        expires: float = self.limiter.clock() + deadline
+        name: str = lane.name
+        self.waiting[name] += 1
+        try:
+            while not self.available(name):
+                delay: float = self.wait_time(name)
+                if self.limiter.clock() + delay > expires:
+                    raise RateLimitExceeded(name)
+                await lane.sleep(delay)
+                if lane.name != name:
+                    self.waiting[name] -= 1
+                    name = lane.name
+                    self.waiting[name] += 1
+            self.limiter.consume()
+        finally:
+            self.waiting[name] -= 1
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.inflight: Dict[Hashable, asyncio.Future] = {}
+        self.lanes: Dict[Hashable, Lane] = {}
+        self.requests: int = 0
+        self.duplicates: int = 0
+
+    async def run(self,
+                  key: Hashable,
+                  factory: Callable[[], Awaitable[T]],
+                  lane: Optional[Lane]=None,
+                  timeout: Optional[float]=None) -> T:
+        self.requests += 1
+        future: asyncio.Future
+        if key in self.inflight:
+            self.duplicates += 1
+            future = self.inflight[key]
+            if lane is not None and key in self.lanes:
+                self.lanes[key].join(lane)
+            if timeout is not None:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+        else:
+            future = asyncio.ensure_future(factory())
+            self.inflight[key] = future
+            if lane is not None:
+                self.lanes[key] = lane
+            future.add_done_callback(lambda f: self.finished(key, f))
+        return await asyncio.shield(future)
+
+    def finished(self,
+                 key: Hashable,
+                 future: asyncio.Future) -> None:
+        if self.inflight.get(key) is future:
+            del self.inflight[key]
+            self.lanes.pop(key, None)
@@ -0,0 +1,194 @@
+﻿import time
+from datetime import timedelta
+from types import TracebackType
+from typing import Any, Callable, Dict, Optional, Tuple, Type  # noqa: F401
+
+from . import speedrundata
+
+
+class ChannelSettings:
+    def __init__(self, channel: str) -> None:
+        self.channel: str = channel
+        self.version: int = 0
+        self.user: Optional[str] = None
+        self.game: Optional[str] = None
+        self.levels: Dict[str, str] = {}
+        self.categories: Dict[Tuple[str, str], str] = {}
+        self.variables: Dict[Tuple[str, str, str], Dict[str, str]] = {}
+        self.regions: Dict[str, Optional[str]] = {}
+        self.platforms: Dict[str, Optional[str]] = {}
+
+    def userid(self) -> str:
+        return self.user if self.user is not None else self.channel
+
+    def levelid(self, gameid: str) -> Optional[str]:
+        return self.levels.get(gameid) or None
+
+    def categoryid(self,
+                   gameid: str,
+                   levelid: Optional[str]) -> Optional[str]:
+        return self.categories.get((gameid, levelid or ''))
+
+    def variable_values(self,
+                        gameid: str,
+                        levelid: Optional[str],
+                        categoryid: Optional[str]) -> Dict[str, str]:
+        return self.variables.get((gameid, levelid or '', categoryid or ''),
+                                  {})
+
+    def regionid(self, gameid: str) -> Optional[str]:
+        return self.regions.get(gameid)
+
+    def platformid(self, gameid: str) -> Optional[str]:
+        return self.platforms.get(gameid)
+
+
+class SettingsCache:
+    def __init__(self,
+                 duration: timedelta,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        self.duration: float = duration.total_seconds()
+        self.clock: Callable[[], float] = clock
+        self.entries: Dict[str, ChannelSettings] = {}
+        self.loaded: Dict[str, float] = {}
+        self.generation: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, channel: str) -> Optional[ChannelSettings]:
+        if channel in self.entries:
+            if self.clock() - self.loaded[channel] < self.duration:
+                self.hits += 1
+                return self.entries[channel]
+            del self.entries[channel]
+            del self.loaded[channel]
+        self.misses += 1
+        return None
+
+    def peek(self, channel: str) -> Optional[ChannelSettings]:
+        return self.entries.get(channel)
+
+    def store(self,
+              settings: ChannelSettings,
+              generation: int) -> None:
+        if generation != self.generation:
+            return
+        self.entries[settings.channel] = settings
+        self.loaded[settings.channel] = self.clock()
+
+    def written(self, channel: str) -> Optional[ChannelSettings]:
+        self.generation += 1
+        settings: Optional[ChannelSettings] = self.entries.get(channel)
+        if settings is not None:
+            settings.version += 1
+        return settings
+
+    def invalidate(self, channel: Optional[str]=None) -> None:
+        self.generation += 1
+        if channel is None:
+            self.entries.clear()
+            self.loaded.clear()
+        else:
+            self.entries.pop(channel, None)
+            self.loaded.pop(channel, None)
+
+
+class TwitchGameCache:
+    def __init__(self,
+                 duration: timedelta,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        self.duration: float = duration.total_seconds()
+        self.clock: Callable[[], float] = clock
+        self.entries: Dict[str, Optional[str]] = {}
+        self.loaded: Dict[str, float] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, twitchGame: str) -> Tuple[bool, Optional[str]]:
+        game: str = twitchGame.lower()
+        if game in self.entries:
+            if self.clock() - self.loaded[game] < self.duration:
+                self.hits += 1
+                return True, self.entries[game]
+            del self.entries[game]
+            del self.loaded[game]
+        self.misses += 1
+        return False, None
+
+    def store(self,
+              twitchGame: str,
+              gameId: Optional[str]) -> None:
+        game: str = twitchGame.lower()
+        self.entries[game] = gameId
+        self.loaded[game] = self.clock()
+
+    def invalidate(self) -> None:
+        self.entries.clear()
+        self.loaded.clear()
+
+
+class ResolvedLeaderboard:
+    def __init__(self,
+                 settings: ChannelSettings,
+                 key: Tuple[str, int, int],
+                 levelId: Optional[str],
+                 categoryId: Optional[str],
+                 categories: Dict[str, speedrundata.Category],
+                 id: Optional[speedrundata.LeaderboardId]) -> None:
+        self.settings: ChannelSettings = settings
+        self.key: Tuple[str, int, int] = key
+        self.levelId: Optional[str] = levelId
+        self.categoryId: Optional[str] = categoryId
+        self.categories: Dict[str, speedrundata.Category] = categories
+        self.id: Optional[speedrundata.LeaderboardId] = id
+
+    def current(self,
+                settings: ChannelSettings,
+                key: Tuple[str, int, int]) -> bool:
+        return self.settings is settings and self.key == key
+
+
+class PoolUsage:
+    def __init__(self) -> None:
+        self.acquires: Dict[str, int] = {}
+        self.held: Dict[str, float] = {}
+        self.longest: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.acquires[name] = self.acquires.get(name, 0) + 1
+        self.held[name] = self.held.get(name, 0.0) + seconds
+        self.longest[name] = max(self.longest.get(name, 0.0), seconds)
+
+    def average(self, name: str) -> float:
+        if not self.acquires.get(name):
+            return 0.0
+        return self.held[name] / self.acquires[name]
+
+
+class TimedAcquire:
+    def __init__(self,
+                 usage: PoolUsage,
+                 name: str,
+                 acquire: Callable[[], Any],
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        self.usage: PoolUsage = usage
+        self.name: str = name
+        self.acquire: Callable[[], Any] = acquire
+        self.clock: Callable[[], float] = clock
+        self.context: Any = None
+        self.start: float = 0.0
+
+    async def __aenter__(self) -> Any:
+        self.context = self.acquire()
+        database: Any = await self.context.__aenter__()
+        self.start = self.clock()
+        return database
+
+    async def __aexit__(self,
+                        type: Optional[Type[BaseException]],
+                        value: Optional[BaseException],
+                        traceback: Optional[TracebackType]) -> Any:
+        try:
+            return await self.context.__aexit__(type, value, traceback)
+        finally:
+            self.usage.record(self.name, self.clock() - self.start)
@@ -1,185 +1,237 @@
-﻿from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union  # noqa: F401
+﻿import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union  # noqa: F401,E501
 
 import aioodbc.cursor
 
 import bot
 from bot import data, globals  # noqa: F401
+from lib.data import Send
 from lib.database import DatabaseMain
 
-from .library import speedruncom, speedrundata
+from .library import speedruncom, speedrundata, speedrunrefresh
+from .library import speedrunsettings
 
-calls: List[datetime] = []
-callLimit: int = 90
-callDuration: timedelta = timedelta(minutes=1)
+leaderboardCache: timedelta = speedruncom.leaderboardCacheDuration
+cache: timedelta = speedruncom.cacheDuration
 
-leaderboardCache: timedelta = timedelta(minutes=60)
-cache: timedelta = timedelta(hours=24)
-
-if bot.config.development:
-    leaderboardCache = timedelta(minutes=5)
-    cache = timedelta(minutes=30)
+refreshConcurrency: int = 4
+streamingBoost: float = 4
+refreshKinds: List[Tuple[str, timedelta, float]] = [
+    ('leaderboards', leaderboardCache, 1),
+    ('games', cache, 0.5),
+    ('gameSearch', cache, 0.25),
+    ('playerLookup', cache, 0.5),
+    ('platforms', cache, 0.25),
+    ('regions', cache, 0.25),
+    ]
 
 
 async def refresh(timestamp: datetime) -> None:
-    global calls
-    if 'srcRefreshCalls' not in globals.globalSessionData:
-        globals.globalSessionData['srcRefreshCalls'] = []
-    calls = globals.globalSessionData['srcRefreshCalls']
-    recentCalls: List[datetime]
-    recentCalls = [c for c in calls if timestamp - c < callDuration]
-    if len(recentCalls) >= callLimit:
-        return
-    globals.globalSessionData['srcRefreshCalls'] = recentCalls
-    calls = recentCalls
-
-    t: str
-    id: Union[speedrundata.LeaderboardId, str]
-    for t, id in ((t, i) for t, i in speedruncom.cache.copy()
-                  if t == 'leaderboards'):
-        assert isinstance(id, speedrundata.LeaderboardId)
-        if (t, id) not in speedruncom.cache:
-            continue
-        if timestamp - speedruncom.cache[t, id] < leaderboardCache:
-            continue
-        requestTime: datetime = speedruncom.leaderboardRequest[id]
-        if timestamp - requestTime > leaderboardCache * 2:
-            continue
-        speedruncom.cache[t, id] = timestamp
-        calls.append(timestamp)
-        await speedruncom.read_leaderboard(id, timestamp)
+    if not speedruncom.circuitBreaker.available():
         return
-    for t, id in ((t, i) for t, i in speedruncom.cache if t == 'games'):
-        assert isinstance(id, str)
-        if (t, id) not in speedruncom.cache:
-            continue
-        if timestamp - speedruncom.cache[t, id] < cache:
-            continue
-        speedruncom.cache[t, id] = timestamp
-        calls.append(timestamp)
-        await speedruncom.read_speedrun_game_by_id(id, timestamp)
+    if not speedruncom.requestScheduler.available('background'):
         return
-    oldCache = ((t, i) for t, i in speedruncom.cache.copy()
-                if t in ['gameSearch', 'bestSearch'])
-    for t, search in oldCache:
-        assert isinstance(search, str)
-        if (t, search) not in speedruncom.cache:
-            continue
-        if timestamp - speedruncom.cache[t, search] < cache:
+
+    nextRefresh: Optional[datetime] = next_refresh()
+    if nextRefresh is not None and nextRefresh <= timestamp:
+        if await refresh_cache(timestamp):
+            return
+
+    # Proactive loading
+    await load_info(timestamp)
+
+
+async def snapshot(timestamp: datetime) -> None:
+    data_: bytes = speedruncom.dump_snapshot()
+    loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, speedruncom.write_snapshot, data_)
+    await speedruncom.prune_responses()
+
+
+def next_refresh() -> Optional[datetime]:
+    nextRefresh: Optional[datetime] = None
+    kind: str
+    duration: timedelta
+    for kind, duration, _ in refreshKinds:
+        oldest: Optional[Tuple[Hashable, datetime]]
+        oldest = speedruncom.cache.oldest(kind)
+        if oldest is None:
             continue
-        speedruncom.cache[t, search] = timestamp
-        calls.append(timestamp)
-        calls.append(timestamp)
-        await speedruncom.read_speedrun_search_game(search, timestamp)
-        return
-    for t, id in ((t, i) for t, i in speedruncom.cache.copy()
-                  if t == 'playerLookup'):
+        if nextRefresh is None or oldest[1] + duration < nextRefresh:
+            nextRefresh = oldest[1] + duration
+    return nextRefresh
+
+
+def is_streaming(channel: str) -> bool:
+    return (channel in globals.channels
+            and bool(globals.channels[channel].isStreaming))
+
+
+def refresh_queue(timestamp: datetime) -> List[speedrunrefresh.Candidate]:
+    candidates: List[speedrunrefresh.Candidate] = []
+    kind: str
+    duration: timedelta
+    weight: float
+    for kind, duration, weight in refreshKinds:
+        id: Hashable
+        refreshed: datetime
+        for id, refreshed in speedruncom.cache.expired(kind,
+                                                       timestamp - duration):
+            recency: float = 0
+            if kind == 'leaderboards':
+                assert isinstance(id, speedrundata.LeaderboardId)
+                requestTime: Optional[datetime]
+                requestTime = speedruncom.leaderboardRequest.get(id)
+                if (requestTime is None
+                        or timestamp - requestTime > leaderboardCache * 2):
+                    speedruncom.cache.park(kind, id)
+                    continue
+                recency = 1 - ((timestamp - requestTime)
+                               / (leaderboardCache * 2))
+            key: Tuple[str, Hashable] = kind, id
+            streaming: bool = any(
+                is_streaming(c) for c in speedruncom.refreshDemand.owners(key))
+            score: float = speedrunrefresh.score(
+                (timestamp - refreshed) / duration, weight,
+                speedruncom.refreshDemand.score(key, timestamp), recency,
+                streaming, streamingBoost)
+            candidates.append(
+                speedrunrefresh.Candidate(kind, id, refreshed, score))
+    candidates.sort(key=lambda c: c.score, reverse=True)
+    return candidates
+
+
+def refresh_slots() -> int:
+    budget: int = (speedruncom.rateLimiter.remaining()
+                   - speedruncom.requestScheduler.reserved)
+    return max(min(refreshConcurrency, budget), 1)
+
+
+async def refresh_cache(timestamp: datetime) -> bool:
+    queue: List[speedrunrefresh.Candidate] = refresh_queue(timestamp)
+    if not queue:
+        return False
+    await asyncio.gather(*[refresh_entry(c, timestamp)
+                           for c in queue[:refresh_slots()]])
+    return True
+
+
+async def refresh_entry(candidate: speedrunrefresh.Candidate,
+                        timestamp: datetime) -> None:
+    id: Hashable = candidate.id
+    if candidate.kind == 'leaderboards':
+        assert isinstance(id, speedrundata.LeaderboardId)
+        await speedruncom.read_leaderboard(id, timestamp, 'background')
+    elif candidate.kind == 'games':
         assert isinstance(id, str)
-        if timestamp - speedruncom.cache[t, id] < cache:
-            continue
-        speedruncom.cache[t, id] = timestamp
-        calls.append(timestamp)
-        calls.append(timestamp)
-        calls.append(timestamp)
-        calls.append(timestamp)
-        await speedruncom.read_user(id, timestamp)
-        return
-    for t, id in ((t, i) for t, i in speedruncom.cache.copy()
-                  if t == 'platforms'):
+        await speedruncom.read_speedrun_game_by_id(id, timestamp,
+                                                   'background')
+    elif candidate.kind == 'gameSearch':
         assert isinstance(id, str)
-        if (t, id) not in speedruncom.cache:
-            continue
-        if timestamp - speedruncom.cache[t, id] < cache:
-            continue
-        speedruncom.cache[t, id] = timestamp
-        calls.append(timestamp)
-        await speedruncom.read_platforms(timestamp)
-        return
-    for t, id in ((t, i) for t, i in speedruncom.cache.copy()
-                  if t == 'regions'):
+        await speedruncom.read_speedrun_search_game(id, timestamp,
+                                                    'background')
+    elif candidate.kind == 'playerLookup':
         assert isinstance(id, str)
-        if (t, id) not in speedruncom.cache:
-            continue
-        if timestamp - speedruncom.cache[t, id] < cache:
-            continue
-        speedruncom.cache[t, id] = timestamp
-        calls.append(timestamp)
-        await speedruncom.read_regions(timestamp)
-        return
+        await speedruncom.read_user(id, timestamp, 'background')
+    elif candidate.kind == 'platforms':
+        await speedruncom.read_platforms(timestamp, 'background')
+    elif candidate.kind == 'regions':
+        await speedruncom.read_regions(timestamp, 'background')
 
-    # Proactive loading
+
+def describe_key(id: Hashable) -> str:
+    if isinstance(id, speedrundata.LeaderboardId):
+        return '/'.join(i for i in [id.gameid, id.levelid, id.categoryid]
+                        if i is not None)
+    return str(id)
+
+
+def botSpeedrunQueue(send: Send,
+                     timestamp: datetime) -> None:
+    queue: List[speedrunrefresh.Candidate] = refresh_queue(timestamp)
+    send(f'Speedrun.com refresh queue: {len(queue)} due')
+    send([f'{c.kind} {describe_key(c.id)} score {c.score:.2f}'
+          for c in queue[:10]])
+
+
+async def load_info(timestamp: datetime) -> None:
     db: DatabaseMain
-    async with DatabaseMain.acquire() as db, await db.cursor() as cursor:
-        await load_info(timestamp, cursor)
+    cursor: aioodbc.cursor.Cursor
+    async with speedruncom.acquire_database('refresh') as db, \
+            await db.cursor() as cursor:
+        activeChannels = await speedruncom.channels_active(cursor)
+        live: List[str] = [c for c, ch in globals.channels.items()
+                           if (ch.isStreaming or bot.config.development)
+                           if c in activeChannels]
+        settings: Dict[str, speedrunsettings.ChannelSettings]
+        settings = await speedruncom.channels_settings(cursor, live)
+        twitchGames: Dict[str, Optional[str]]
+        twitchGames = await speedruncom.twitch_gameids(
+            cursor, [globals.channels[c].twitchGame for c in live
+                     if c in globals.channels
+                     if settings[c].game is None
+                     if globals.channels[c].twitchGame])
+    slots: int = refresh_slots()
+    pending: Dict[Tuple[str, Hashable], Awaitable[None]] = {}
 
+    def schedule(key: Tuple[str, Hashable],
+                 load: Callable[[], Awaitable[None]]) -> None:
+        if key not in pending:
+            pending[key] = load()
 
-async def load_info(timestamp: datetime,
-                    cursor: aioodbc.cursor.Cursor) -> None:
-    activeChannels = await speedruncom.channels_active(cursor)
-    live: List[str] = [c for c, ch in globals.channels.items()
-                       if (ch.isStreaming or bot.config.development)
-                       if c in activeChannels]
     channel: str
     for channel in live:
+        if len(pending) >= slots:
+            break
         if channel not in globals.channels:
             continue
         chat: data.Channel = globals.channels[channel]
-        user: str = await speedruncom.channel_user(cursor, chat)
+        channelSettings: speedrunsettings.ChannelSettings = settings[channel]
+        user: str = channelSettings.userid()
+        speedruncom.refreshDemand.own(('playerLookup', user), channel)
         if need_load_channel(user, timestamp):
-            calls.append(timestamp)
-            calls.append(timestamp)
-            calls.append(timestamp)
-            calls.append(timestamp)
-            await speedruncom.read_user(user, timestamp)
-            return
-        gameId: Optional[str] = await speedruncom.channel_gameid(cursor, chat)
+            schedule(('playerLookup', user),
+                     lambda: speedruncom.read_user(user, timestamp,
+                                                   'background'))
+            continue
+        gameId: Optional[str] = channelSettings.game
         if gameId is None and chat.twitchGame:
             game: str = chat.twitchGame.lower()
-            gameId = await speedruncom.twitch_gameid(cursor, game)
+            speedruncom.refreshDemand.own(('gameSearch', game), channel)
+            gameId = twitchGames.get(game)
             if not gameId:
                 if need_load_game_search(game, timestamp):
-                    calls.append(timestamp)
-                    await speedruncom.read_speedrun_search_game(
-                        game, timestamp)
-                    return
+                    schedule(('gameSearch', game),
+                             lambda: speedruncom.read_speedrun_search_game(
+                                 game, timestamp, 'background'))
+                    continue
                 if game in speedruncom.gameSearch:
                     gameId = speedruncom.gameSearch[game]
         if gameId is None:
             continue
+        speedruncom.refreshDemand.own(('games', gameId), channel)
         if need_load_game(gameId, timestamp):
-            calls.append(timestamp)
-            await speedruncom.read_speedrun_game_by_id(gameId, timestamp)
-            return
+            schedule(('games', gameId),
+                     lambda: speedruncom.read_speedrun_game_by_id(
+                         gameId, timestamp, 'background'))
+            continue
         if gameId not in speedruncom.games:
-            return
-        levelId: Optional[str] = await speedruncom.channel_levelid(
-            cursor, chat, gameId)
-        maybeCategoryId: Optional[str] = await speedruncom.channel_categoryid(
-            cursor, chat, gameId, levelId)
-        categoryId: str
-        if maybeCategoryId is not None:
-            categoryId = maybeCategoryId
-        else:
-            cId: Optional[str] = speedruncom.default_categoryid(
-                speedruncom.games[gameId].game_categories)
-            if cId is None:
-                return
-            categoryId = cId
-        variables: Dict[str, str] = speedruncom.default_sub_categories(
-            speedruncom.games[gameId], levelId, categoryId)
-        variables.update(await speedruncom.channel_variables(
-            cursor, chat, gameId, levelId, categoryId))
-        regionId: Optional[str]
-        platformId: Optional[str]
-        regionId = await speedruncom.channel_region(cursor, chat, gameId)
-        platformId = await speedruncom.channel_platform(cursor, chat, gameId)
-        leaderboardId: speedrundata.LeaderboardId = speedrundata.LeaderboardId(
-            gameId, levelId, categoryId, regionId, platformId, variables)
+            continue
+        resolved: speedrunsettings.ResolvedLeaderboard
+        resolved = speedruncom.resolve_leaderboard(
+            channelSettings, speedruncom.games[gameId])
+        if resolved.id is None:
+            continue
+        leaderboardId: speedrundata.LeaderboardId = resolved.id
         if need_load_leaderboard(leaderboardId, timestamp):
-            calls.append(timestamp)
-            await speedruncom.load_leaderboard(leaderboardId, timestamp)
-            return
-        speedruncom.active_leaderboard(leaderboardId, timestamp)
+            schedule(('leaderboards', leaderboardId),
+                     lambda: speedruncom.load_leaderboard(
+                         leaderboardId, timestamp, 'background', channel))
+            continue
+        speedruncom.active_leaderboard(leaderboardId, timestamp, channel)
+    if pending:
+        await asyncio.gather(*pending.values())
 
 
 def need_load_channel(channel: str,
@@ -0,0 +1,123 @@
+﻿import unittest
+from datetime import datetime, timedelta
+from typing import Hashable, List, Tuple
+
+from ..library import speedruncache
+
+start: datetime = datetime(2000, 1, 1)
+
+
+def at(minutes: int) -> datetime:
+    return start + timedelta(minutes=minutes)
+
+
+class TestLruDict(unittest.TestCase):
+    def test_evict_oldest(self) -> None:
+        lru: speedruncache.LruDict = speedruncache.LruDict(2)
+        lru['a'] = 1
+        lru['b'] = 2
+        lru['c'] = 3
+        self.assertEqual(lru.evict(), [('a', 1)])
+        self.assertEqual(list(lru), ['b', 'c'])
+
+    def test_touch(self) -> None:
+        lru: speedruncache.LruDict = speedruncache.LruDict(2)
+        lru['a'] = 1
+        lru['b'] = 2
+        lru.touch('a')
+        lru['c'] = 3
+        self.assertEqual(lru.evict(), [('b', 2)])
+
+    def test_set_moves_to_end(self) -> None:
+        lru: speedruncache.LruDict = speedruncache.LruDict(2)
+        lru['a'] = 1
+        lru['b'] = 2
+        lru['a'] = 3
+        lru['c'] = 4
+        self.assertEqual(lru.evict(), [('b', 2)])
+        self.assertEqual(lru['a'], 3)
+
+    def test_touch_missing(self) -> None:
+        lru: speedruncache.LruDict = speedruncache.LruDict(1)
+        lru.touch('a')
+        self.assertEqual(len(lru), 0)
+        self.assertEqual(lru.evict(), [])
+
+
+class TestTimestampCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache: speedruncache.TimestampCache
+        self.cache = speedruncache.TimestampCache(['games'])
+
+    def expired(self, minutes: int) -> List[Tuple[Hashable, datetime]]:
+        return sorted(self.cache.expired('games', at(minutes)),
+                      key=lambda e: e[1])
+
+    def test_expired(self) -> None:
+        self.cache['games', 'a'] = at(1)
+        self.cache['games', 'b'] = at(3)
+        self.cache['games', 'c'] = at(2)
+        self.assertEqual(self.expired(2), [('a', at(1)), ('c', at(2))])
+        self.assertEqual(self.cache.oldest('games'), ('a', at(1)))
+
+    def test_overwrite(self) -> None:
+        self.cache['games', 'a'] = at(1)
+        self.cache['games', 'a'] = at(5)
+        self.assertEqual(self.expired(2), [])
+        self.assertEqual(self.expired(5), [('a', at(5))])
+        self.assertEqual(self.cache.sizes['games'], 1)
+
+    def test_delete(self) -> None:
+        self.cache['games', 'a'] = at(1)
+        self.cache['games', 'b'] = at(2)
+        del self.cache['games', 'a']
+        self.assertEqual(self.cache.pop(('games', 'b')), at(2))
+        self.assertIsNone(self.cache.pop(('games', 'c'), None))
+        self.assertEqual(self.expired(5), [])
+        self.assertIsNone(self.cache.oldest('games'))
+        self.assertEqual(self.cache.sizes['games'], 0)
+
+    def test_park(self) -> None:
+        self.cache['games', 'a'] = at(1)
+        self.cache['games', 'b'] = at(2)
+        self.cache.park('games', 'a')
+        self.assertEqual(self.expired(5), [('b', at(2))])
+        self.assertEqual(self.cache.oldest('games'), ('b', at(2)))
+        self.assertEqual(self.cache['games', 'a'], at(1))
+
+    def test_reschedule(self) -> None:
+        self.cache['games', 'a'] = at(1)
+        self.cache.park('games', 'a')
+        self.assertIsNone(self.cache.oldest('games'))
+        self.cache.reschedule('games', 'a')
+        self.assertEqual(self.cache.oldest('games'), ('a', at(1)))
+        self.cache.reschedule('games', 'a')
+        self.assertEqual(self.expired(5), [('a', at(1))])
+
+    def test_set_unparks(self) -> None:
+        self.cache['games', 'a'] = at(1)
+        self.cache.park('games', 'a')
+        self.cache['games', 'a'] = at(1)
+        self.assertEqual(self.expired(5), [('a', at(1))])
+
+    def test_untracked_kind(self) -> None:
+        self.cache['players', 'a'] = at(1)
+        self.assertEqual(self.cache['players', 'a'], at(1))
+        self.assertEqual(self.expired(5), [])
+        del self.cache['players', 'a']
+        self.assertNotIn(('players', 'a'), self.cache)
+
+    def test_compact(self) -> None:
+        minute: int
+        for minute in range(200):
+            self.cache['games', 'a'] = at(minute)
+        self.assertLessEqual(len(self.cache.heaps['games']), 66)
+        self.assertEqual(self.expired(500), [('a', at(199))])
+
+    def test_clear(self) -> None:
+        self.cache['games', 'a'] = at(1)
+        self.cache.park('games', 'a')
+        self.cache.clear()
+        self.assertEqual(self.cache.heaps['games'], [])
+        self.assertEqual(self.cache.sizes['games'], 0)
+        self.assertEqual(self.cache.parked, set())
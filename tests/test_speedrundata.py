@@ -0,0 +1,166 @@
+﻿import random
+import unittest
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..benchmarks import fixtures
+from ..library import speedrundata
+
+Rows = List[Tuple[int, speedrundata.Run]]
+
+
+def run_data(index: int,
+             time: float,
+             players: List[str]) -> Dict[str, Any]:
+    data: Dict[str, Any] = fixtures.run(index, 1)
+    data['times']['primary_t'] = time
+    data['players'] = [{'rel': 'user', 'id': p} for p in players]
+    return data
+
+
+def placed(runs: List[speedrundata.Run]) -> Rows:
+    rows: Rows = []
+    run: speedrundata.Run
+    for run in sorted(runs, key=lambda r: r.time):
+        place: int = len(rows) + 1
+        if rows and rows[-1][1].time == run.time:
+            place = rows[-1][0]
+        rows.append((place, run))
+    return rows
+
+
+def build(rows: Rows) -> speedrundata.Leaderboard:
+    leaderboard: speedrundata.Leaderboard
+    leaderboard = speedrundata.Leaderboard('', fixtures.leaderboard())
+    leaderboard.update(rows)
+    return leaderboard
+
+
+def state(leaderboard: speedrundata.Leaderboard) -> Tuple[Any, ...]:
+    return (leaderboard.runIds, list(leaderboard.places),
+            list(leaderboard.times), list(leaderboard.playerIndex),
+            leaderboard.players, leaderboard.rowByRun,
+            leaderboard.rowByPlayer)
+
+
+def kinds(changes: List[speedrundata.LeaderboardChange]) -> List[str]:
+    return [c.kind for c in changes]
+
+
+class TestLeaderboardUpdate(unittest.TestCase):
+    def setUp(self) -> None:
+        self.runs: Dict[str, speedrundata.Run] = {}
+        self.next: int = 0
+
+    def new_run(self,
+                time: float,
+                *players: str) -> speedrundata.Run:
+        run: speedrundata.Run
+        run = speedrundata.Run(run_data(self.next, time, list(players)))
+        self.runs[run.id] = run
+        self.next += 1
+        return run
+
+    def mutate(self,
+               random_: random.Random,
+               runs: List[speedrundata.Run]) -> List[speedrundata.Run]:
+        runs = list(runs)
+        action: int
+        for action in [random_.randrange(5)
+                       for _ in range(random_.randint(1, 3))]:
+            if action == 0 and runs:
+                runs.pop(random_.randrange(len(runs)))
+            elif action == 1:
+                runs.append(self.new_run(random_.randint(1, 50),
+                                         f'p{random_.randrange(10)}'))
+            elif action == 2 and runs:
+                run: speedrundata.Run = random_.choice(runs)
+                run.time = random_.randint(1, 50) * 1000
+            elif action == 3 and runs:
+                run = random_.choice(runs)
+                run.playerids = [f'p{random_.randrange(10)}'
+                                 for _ in range(random_.randint(0, 2))]
+        return runs
+
+    def test_update_matches_rebuild(self) -> None:
+        random_: random.Random = random.Random(0)
+        trial: int
+        for trial in range(200):
+            runs: List[speedrundata.Run]
+            runs = [self.new_run(random_.randint(1, 50),
+                                 f'p{random_.randrange(10)}')
+                    for _ in range(random_.randint(0, 20))]
+            leaderboard: speedrundata.Leaderboard = build(placed(runs))
+            step: int
+            for step in range(5):
+                runs = self.mutate(random_, runs)
+                rows: Rows = placed(runs)
+                leaderboard.update(rows)
+                with self.subTest(trial=trial, step=step):
+                    self.assertEqual(state(leaderboard), state(build(rows)))
+
+    def test_unchanged(self) -> None:
+        rows: Rows = placed([self.new_run(10, 'a'), self.new_run(20, 'b')])
+        leaderboard: speedrundata.Leaderboard = build(rows)
+        version: int = leaderboard.version
+        self.assertEqual(leaderboard.update(list(rows)), [])
+        self.assertEqual(leaderboard.version, version)
+
+    def test_world_record(self) -> None:
+        old: speedrundata.Run = self.new_run(10, 'a')
+        leaderboard: speedrundata.Leaderboard = build(placed([old]))
+        new: speedrundata.Run = self.new_run(5, 'b')
+        changes: List[speedrundata.LeaderboardChange]
+        changes = leaderboard.update(placed([old, new]))
+        self.assertEqual(kinds(changes),
+                         ['world-record', 'personal-best', 'places-shifted'])
+        self.assertEqual(changes[0].runId, new.id)
+        self.assertEqual(changes[0].previousRunId, old.id)
+        self.assertEqual(changes[1].playerId, 'b')
+        self.assertIsNone(changes[1].previousRunId)
+        self.assertEqual(changes[2].count, 1)
+
+    def test_personal_best(self) -> None:
+        first: speedrundata.Run = self.new_run(10, 'a')
+        old: speedrundata.Run = self.new_run(30, 'b')
+        leaderboard: speedrundata.Leaderboard = build(placed([first, old]))
+        new: speedrundata.Run = self.new_run(20, 'b')
+        changes: List[speedrundata.LeaderboardChange]
+        changes = leaderboard.update(placed([first, new]))
+        self.assertEqual(kinds(changes), ['personal-best', 'runs-removed'])
+        self.assertEqual(changes[0].runId, new.id)
+        self.assertEqual(changes[0].playerId, 'b')
+        self.assertEqual(changes[0].previousRunId, old.id)
+        self.assertEqual(changes[1].count, 1)
+        self.assertEqual(leaderboard.personal_best('b'), new.id)
+
+    def test_slower_run_is_updated(self) -> None:
+        runs: List[speedrundata.Run]
+        runs = [self.new_run(10, 'a'), self.new_run(20, 'b'),
+                self.new_run(30, 'c')]
+        leaderboard: speedrundata.Leaderboard = build(placed(runs))
+        runs[1].time = 25000
+        changes: List[speedrundata.LeaderboardChange]
+        changes = leaderboard.update(placed(runs))
+        self.assertEqual(kinds(changes), ['updated'])
+        self.assertEqual(leaderboard.times[1], 25000)
+
+    def test_players_changed_in_place(self) -> None:
+        run: speedrundata.Run = self.new_run(10, 'a')
+        leaderboard: speedrundata.Leaderboard = build(placed([run]))
+        run.playerids = ['b']
+        changes: List[speedrundata.LeaderboardChange]
+        changes = leaderboard.update(placed([run]))
+        self.assertEqual(kinds(changes), ['personal-best'])
+        self.assertEqual(changes[0].playerId, 'b')
+        self.assertIsNone(leaderboard.personal_best('a'))
+        self.assertEqual(leaderboard.personal_best('b'), run.id)
+
+    def test_tied_places(self) -> None:
+        runs: List[speedrundata.Run]
+        runs = [self.new_run(10, 'a'), self.new_run(10, 'b'),
+                self.new_run(20, 'c')]
+        leaderboard: speedrundata.Leaderboard = build(placed(runs))
+        self.assertEqual(list(leaderboard.places), [1, 1, 3])
+        self.assertEqual(leaderboard.world_records(), [runs[0].id, runs[1].id])
+        place: Optional[int] = leaderboard.place(runs[2].id)
+        self.assertEqual(place, 3)
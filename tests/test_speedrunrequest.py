@@ -0,0 +1,149 @@
+﻿import asyncio
+import unittest
+from datetime import timedelta
+
+from ..library import speedrunrequest
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock: Clock = Clock()
+        self.bucket: speedrunrequest.TokenBucket
+        self.bucket = speedrunrequest.TokenBucket(
+            10, timedelta(seconds=10), self.clock)
+
+    def test_starts_full(self) -> None:
+        self.assertEqual(self.bucket.remaining(), 10)
+        self.assertEqual(self.bucket.wait_time(), 0)
+        self.assertEqual(self.bucket.reset_time(), 0)
+
+    def test_consume(self) -> None:
+        self.bucket.consume(3)
+        self.assertEqual(self.bucket.remaining(), 7)
+        self.assertAlmostEqual(self.bucket.reset_time(), 3)
+
+    def test_try_consume(self) -> None:
+        self.assertTrue(self.bucket.try_consume(10))
+        self.assertFalse(self.bucket.try_consume())
+        self.assertAlmostEqual(self.bucket.wait_time(), 1)
+        self.assertAlmostEqual(self.bucket.wait_time(3), 3)
+
+    def test_refill(self) -> None:
+        self.bucket.consume(10)
+        self.clock.now = 2.5
+        self.assertEqual(self.bucket.remaining(), 2)
+        self.clock.now = 100
+        self.assertEqual(self.bucket.remaining(), 10)
+
+    def test_overdrawn(self) -> None:
+        self.bucket.consume(12)
+        self.assertEqual(self.bucket.remaining(), 0)
+        self.assertAlmostEqual(self.bucket.wait_time(), 3)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock: Clock = Clock()
+        self.breaker: speedrunrequest.CircuitBreaker
+        self.breaker = speedrunrequest.CircuitBreaker(2, 60, self.clock)
+
+    def open(self) -> None:
+        self.breaker.failure()
+        self.breaker.failure()
+
+    def test_opens_at_threshold(self) -> None:
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_time(), 60)
+
+    def test_success_resets(self) -> None:
+        self.breaker.failure()
+        self.breaker.success()
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_probe(self) -> None:
+        self.open()
+        self.clock.now = 60
+        self.assertTrue(self.breaker.available())
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertFalse(self.breaker.allow())
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self) -> None:
+        self.open()
+        self.clock.now = 60
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_time(), 60)
+
+    def test_cancelled_probe(self) -> None:
+        self.open()
+        self.clock.now = 60
+        self.assertTrue(self.breaker.allow())
+        self.breaker.cancel()
+        self.assertTrue(self.breaker.allow())
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock: Clock = Clock()
+        self.bucket: speedrunrequest.TokenBucket
+        self.bucket = speedrunrequest.TokenBucket(
+            10, timedelta(seconds=10), self.clock)
+        self.scheduler: speedrunrequest.RequestScheduler
+        self.scheduler = speedrunrequest.RequestScheduler(self.bucket, 5)
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self) -> None:
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_reserve(self) -> None:
+        self.bucket.consume(5)
+        self.assertFalse(self.scheduler.available('background'))
+        self.assertTrue(self.scheduler.available('interactive'))
+
+    def test_promoted_flight(self) -> None:
+        self.bucket.consume(7)
+        flights: speedrunrequest.SingleFlight = speedrunrequest.SingleFlight()
+        background: speedrunrequest.Lane = speedrunrequest.Lane('background')
+        interactive: speedrunrequest.Lane
+        interactive = speedrunrequest.Lane('interactive')
+
+        async def request() -> str:
+            await self.scheduler.acquire(background, 60)
+            return 'done'
+
+        async def main() -> str:
+            first: asyncio.Future = asyncio.ensure_future(
+                flights.run('url', request, background))
+            while not self.scheduler.waiting['background']:
+                await asyncio.sleep(0)
+            result: str = await flights.run('url', request, interactive, 1)
+            self.assertEqual(await first, result)
+            return result
+
+        self.assertEqual(self.loop.run_until_complete(main()), 'done')
+        self.assertEqual(background.name, 'interactive')
+        self.assertEqual(flights.duplicates, 1)
+        self.assertEqual(self.scheduler.waiting,
+                         {'interactive': 0, 'background': 0})
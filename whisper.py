@@ -1,6 +1,7 @@
 ﻿from lib.data import WhisperCommandArgs
 from lib.helper.whisper import permission, send
 
+from . import tasks
 from .library import speedruncom
 
 
@@ -8,3 +9,15 @@ from .library import speedruncom
 async def commandReloadSpeedrun(args: WhisperCommandArgs) -> bool:
     speedruncom.botReloadSpeedrun(send(args.nick))
     return True
+
+
+@permission('manager')
+async def commandSpeedrunStats(args: WhisperCommandArgs) -> bool:
+    speedruncom.botSpeedrunStats(send(args.nick))
+    return True
+
+
+@permission('manager')
+async def commandSpeedrunQueue(args: WhisperCommandArgs) -> bool:
+    tasks.botSpeedrunQueue(send(args.nick), args.timestamp)
+    return True